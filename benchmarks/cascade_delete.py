@@ -0,0 +1,88 @@
+"""
+Compare deleting a movie through Django's collector with ``bulk_delete``.
+
+Runs against a throwaway test database (the configured database is never
+touched). Each approach deletes one movie seeded with the same number of
+reviews, comments and ratings; the script reports wall time, SQL statements
+and peak Python memory for both.
+
+    python benchmarks/cascade_delete.py --reviews 3000
+"""
+import argparse
+import os
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'movie.settings')
+
+import django  # noqa: E402
+
+django.setup()
+
+from django.db import connection  # noqa: E402
+from django.test.utils import setup_test_environment  # noqa: E402
+
+from movies.models import Movie, Review, Rating, Comment, RatingRollup  # noqa: E402
+
+
+def seed(title, reviews):
+    """Create a movie with ``reviews`` reviews, two comments per review and one rating per reviewer."""
+    movie = Movie.objects.create(title=title, director="Benchmark", release_year=2000, rating=4.0)
+    Review.objects.bulk_create(
+        Review(movie=movie, user_name=f"user{i}", title="T", content="C", rating=4) for i in range(reviews)
+    )
+    review_ids = Review.objects.filter(movie=movie).values_list('pk', flat=True)
+    Comment.objects.bulk_create(
+        Comment(movie=movie, review_id=review_id, user_name="commenter", content="C")
+        for review_id in review_ids for _ in range(2)
+    )
+    Rating.objects.bulk_create(
+        Rating(movie=movie, user_name=f"user{i}", rating=1 + i % 5) for i in range(reviews)
+    )
+    Movie.objects.filter(pk=movie.pk).refresh_rating_aggregates()
+    for rating in Rating.objects.filter(movie=movie).values('created_at', 'rating').iterator():
+        RatingRollup.objects.add_ratings(movie.pk, rating['created_at'], rating['rating'])
+    return movie
+
+
+def measure(label, delete):
+    statements = 0
+
+    def count(execute, sql, params, many, context):
+        nonlocal statements
+        statements += 1
+        return execute(sql, params, many, context)
+
+    tracemalloc.start()
+    start = time.perf_counter()
+    with connection.execute_wrapper(count):
+        delete()
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{label:<14} {elapsed:>9.3f} s {statements:>10} {peak / 2**20:>11.1f} MiB")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--reviews', type=int, default=1000, help="Reviews (and ratings) per movie.")
+    args = parser.parse_args()
+
+    setup_test_environment()
+    old_name = connection.creation.create_test_db(verbosity=0)
+    try:
+        collector_movie = seed("Collector", args.reviews)
+        bulk_movie = seed("Bulk", args.reviews)
+        print(f"{args.reviews} reviews, {2 * args.reviews} comments, {args.reviews} ratings per movie")
+        print(f"{'approach':<14} {'time':>11} {'statements':>10} {'peak memory':>15}")
+        measure("collector", collector_movie.delete)
+        measure("bulk_delete", Movie.objects.filter(pk=bulk_movie.pk).bulk_delete)
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,98 @@
+"""
+Compare movie summary queries against the database and the catalog snapshot.
+
+Runs against a throwaway test database (the configured database is never
+touched). Each case is a filter and ordering the ``?nested=false`` listing
+accepts; the script reports the mean time per query for both paths and
+checks that they return the same rows.
+
+    python benchmarks/catalog_snapshot.py --movies 50000
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'movie.settings')
+
+import django  # noqa: E402
+
+django.setup()
+
+from django.db import connection  # noqa: E402
+from django.test.utils import setup_test_environment  # noqa: E402
+
+from movies.catalog import FIELDS, CatalogSnapshot  # noqa: E402
+from movies.models import Movie  # noqa: E402
+
+CASES = [
+    ({}, 'id', 20),
+    ({}, '-rating', 20),
+    ({}, 'title', None),
+    ({'release_year__gte': 2000, 'release_year__lte': 2004}, 'title', 20),
+    ({'release_year__gte': 2000, 'release_year__lte': 2004}, '-rating', None),
+    ({'director': "Director 7"}, 'release_year', None),
+    ({'director': "Director 7", 'rating__gte': 4.0}, '-rating', 10),
+    ({'rating__gte': 4.9}, 'title', 20),
+    ({'rating__gte': 1.5, 'release_year__lte': 2020}, '-release_year', 20),
+]
+
+
+def seed(movies):
+    rng = random.Random(0)
+    Movie.objects.bulk_create(
+        (
+            Movie(
+                title=f"Movie {rng.randrange(10 ** 6):06d} {i}",
+                director=f"Director {rng.randrange(movies // 50 or 1)}",
+                release_year=rng.randint(1920, 2024),
+                rating=rng.randint(10, 50) / 10,
+            )
+            for i in range(movies)
+        ),
+        batch_size=1000,
+    )
+
+
+def from_database(lookups, ordering, limit):
+    movies = Movie.objects.filter(**lookups).order_by(ordering, 'id').values(*FIELDS)
+    return list(movies[:limit] if limit is not None else movies)
+
+
+def timed(run, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        result = run()
+    return (time.perf_counter() - start) / repeat * 1000, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--movies', type=int, default=50000, help="Movies in the catalog.")
+    parser.add_argument('--repeat', type=int, default=20, help="Runs per case.")
+    args = parser.parse_args()
+
+    setup_test_environment()
+    old_name = connection.creation.create_test_db(verbosity=0)
+    try:
+        seed(args.movies)
+        snapshot = CatalogSnapshot(refresh_seconds=float('inf'))
+        start = time.perf_counter()
+        snapshot.load()
+        print(f"{args.movies} movies, snapshot loaded in {time.perf_counter() - start:.2f} s")
+        print(f"{'case':<76} {'rows':>6} {'database':>11} {'snapshot':>11} {'speedup':>8}")
+        for lookups, ordering, limit in CASES:
+            db_ms, expected = timed(lambda: from_database(lookups, ordering, limit), args.repeat)
+            snapshot_ms, result = timed(lambda: snapshot.query(**lookups, ordering=ordering, limit=limit), args.repeat)
+            assert result == expected, (lookups, ordering, limit)
+            label = ' '.join([*(f'{k}={v}' for k, v in lookups.items()), f'ordering={ordering}', f'limit={limit}'])
+            print(f"{label:<76} {len(result):>6} {db_ms:>8.2f} ms {snapshot_ms:>8.2f} ms {db_ms / snapshot_ms:>7.1f}x")
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+
+
+if __name__ == '__main__':
+    main()
@@ -3,6 +3,10 @@ ASGI config for movie project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+Serve the project through this application (e.g. ``uvicorn movie.asgi:application``)
+to use the server-sent events stream at ``/api/v1/events/``; under WSGI
+(including ``manage.py runserver``) that endpoint answers 501.
+
 For more information on this file, see
 https://docs.djangoproject.com/en/6.0/howto/deployment/asgi/
 """
@@ -14,3 +18,7 @@ from django.core.asgi import get_asgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'movie.settings')
 
 application = get_asgi_application()
+
+from movies.schema import warm_up  # noqa: E402
+
+warm_up()
@@ -35,6 +35,71 @@ REST_FRAMEWORK = {
     'DEFAULT_SCHEMA_CLASS': 'drf_spectacular.openapi.AutoSchema',
 }
 
+# Maximum number of entries returned per page of /api/v1/changes/.
+CHANGES_FEED_PAGE_SIZE = 500
+
+# Maximum number of ids accepted by the movies/reviews batch endpoints.
+BATCH_MAX_IDS = 100
+
+# OpenAPI schema served from memory by /api/schema/ (movies/schema.py). Run
+# `python manage.py build_schema` at deploy time to prebuild API_SCHEMA_DIR;
+# set API_CODE_VERSION (e.g. the release tag) to skip hashing the sources.
+# API_SCHEMA_WARM_ON_STARTUP loads (or, without a prebuilt file, generates)
+# the schema when the WSGI/ASGI application starts rather than on the first
+# /api/schema/ request.
+API_SCHEMA_VERSIONS = ['v1']
+API_SCHEMA_DIR = BASE_DIR / 'schema'
+API_SCHEMA_WARM_ON_STARTUP = True
+
+# Raw ratings older than this are archived into the rating rollups by
+# `python manage.py compact_ratings`.
+RATING_RETENTION_DAYS = 365
+
+# Homepage: movies per page, and reviews loaded when a movie's panel expands.
+HOMEPAGE_PAGE_SIZE = 24
+HOMEPAGE_REVIEWS_PER_MOVIE = 10
+# Seconds the homepage's exact movie count is cached between COUNT queries.
+HOMEPAGE_COUNT_CACHE_SECONDS = 60
+
+# Unfiltered admin changelists and homepage pages use an estimated row count
+# above this size (movies.pagination.EstimatedCountPaginator).
+ESTIMATED_COUNT_THRESHOLD = 10000
+
+# Seconds between flushes of the in-memory trending counters to the
+# TrendingCounter table, done by a background thread in each process
+# (movies/trending.py).
+TRENDING_CHECKPOINT_SECONDS = 60
+
+# Serve /api/v1/movies/?nested=false from an in-process columnar snapshot of
+# the movie table, checking the change log for other processes' writes at
+# most every MOVIE_CATALOG_REFRESH_SECONDS (movies/catalog.py).
+MOVIE_CATALOG_SNAPSHOT = False
+MOVIE_CATALOG_REFRESH_SECONDS = 1.0
+
+# Live event stream (/api/v1/events/): buffered events available for
+# Last-Event-ID resume, per-subscriber queue bound, and keep-alive interval.
+EVENTS_HISTORY_SIZE = 1000
+EVENTS_QUEUE_SIZE = 256
+EVENTS_HEARTBEAT_SECONDS = 15
+
+# Load shedding (movies.middleware.LoadSheddingMiddleware): routes are grouped
+# by URL name into classes with their own adaptive concurrency limit; anything
+# unlisted shares the 'default' class. CLIENT_RATE/CLIENT_BURST configure the
+# per-client token bucket (requests per second / bucket size).
+LOAD_SHEDDING = {
+    'ROUTE_CLASSES': {
+        'heavy': ['root', 'movie-list', 'movie-detail', 'movie-batch'],
+        'light': ['movie-average-rating', 'movie-trending', 'review-mark-helpful'],
+    },
+    'CONCURRENCY': {
+        'heavy': {'initial': 8, 'min': 2, 'max': 32, 'target_latency': 0.5},
+        'light': {'initial': 32, 'min': 8, 'max': 128, 'target_latency': 0.1},
+    },
+    'CLIENT_RATE': 50,
+    'CLIENT_BURST': 100,
+    'RETRY_AFTER': 1,
+}
+
 INSTALLED_APPS = [
     'rest_framework',
     'drf_spectacular',
@@ -49,6 +114,7 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'movies.middleware.LoadSheddingMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
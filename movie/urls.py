@@ -16,13 +16,16 @@ Including another URLconf
 """
 from django.contrib import admin
 from django.urls import path, include
-from drf_spectacular.views import SpectacularAPIView, SpectacularSwaggerView
-from movies.views import homepage
+from drf_spectacular.views import SpectacularSwaggerView
+from movies.schema import CachedSchemaView
+from movies.views import homepage, movie_reviews_fragment
 
 urlpatterns = [
     path('', homepage, name='root'),
+    path('movies/<int:movie_id>/reviews/', movie_reviews_fragment, name='movie-reviews-fragment'),
     path('admin/', admin.site.urls),
-    path('api/<str:version>/', include('movies.urls')),
-    path('api/schema/', SpectacularAPIView.as_view(), name='schema'),
+    # Listed before the versioned API so 'schema' is not taken for a version.
+    path('api/schema/', CachedSchemaView.as_view(), name='schema'),
     path('api/docs/', SpectacularSwaggerView.as_view(url_name='schema')),
+    path('api/<str:version>/', include('movies.urls')),
 ]
\ No newline at end of file
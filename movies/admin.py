@@ -1,29 +1,98 @@
-from django.contrib import admin
+from django.contrib import admin, messages
 from .models import Movie, Review, Rating, Comment
+from .pagination import EstimatedCountPaginator
+
+
+class ScalableAdmin(admin.ModelAdmin):
+    """
+    Base admin for large tables: estimated counts and no second full-table count.
+
+    Deletes go through ``bulk_delete`` and the delete confirmation page shows
+    per-table counts, so neither loads the cascaded rows into memory.
+    """
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+    def get_deleted_objects(self, objs, request):
+        """Summarize what a delete cascades to with COUNT queries instead of listing every row."""
+        queryset = self.model._default_manager.filter(pk__in=[obj.pk for obj in objs])
+        model_count = {}
+        perms_needed = set()
+        for model, count in queryset.cascade_counts().items():
+            if not count:
+                continue
+            model_count[model._meta.verbose_name_plural] = count
+            model_admin = self.admin_site._registry.get(model)
+            if model_admin is not None and not model_admin.has_delete_permission(request):
+                perms_needed.add(model._meta.verbose_name)
+        return [str(obj) for obj in objs], model_count, perms_needed, []
+
+    def delete_model(self, request, obj):
+        self.model._default_manager.filter(pk=obj.pk).bulk_delete()
+
+    def delete_queryset(self, request, queryset):
+        queryset.bulk_delete()
+
+
+class UserContentAdmin(ScalableAdmin):
+    """Admin for user-written rows (reviews, ratings, comments)."""
+    actions = ['delete_user_content']
+
+    @admin.action(description="Delete all reviews, ratings and comments by the selected users")
+    def delete_user_content(self, request, queryset):
+        """Remove everything written by the selected rows' users with set-based deletes."""
+        # Evaluated up front: a subquery on this admin's table would come back
+        # empty once that table's rows are deleted partway through the loop.
+        user_names = list(queryset.order_by().values_list('user_name', flat=True).distinct())
+        deleted = sum(
+            model.objects.filter(user_name__in=user_names).bulk_delete()
+            for model in (Comment, Rating, Review)
+        )
+        self.message_user(request, f"Deleted {deleted} rows.", messages.SUCCESS)
+
 
 @admin.register(Movie)
-class MovieAdmin(admin.ModelAdmin):
-    list_display = ['title', 'director', 'release_year', 'rating']
+class MovieAdmin(ScalableAdmin):
+    list_display = ['title', 'director', 'release_year', 'rating', 'average_user_rating', 'user_rating_count']
     search_fields = ['title', 'director']
     list_filter = ['release_year']
+    actions = ['recompute_rating_aggregates']
+
+    @admin.action(description="Recompute user rating aggregates")
+    def recompute_rating_aggregates(self, request, queryset):
+        updated = queryset.refresh_rating_aggregates()
+        self.message_user(request, f"Recomputed rating aggregates for {updated} movies.", messages.SUCCESS)
 
 @admin.register(Review)
-class ReviewAdmin(admin.ModelAdmin):
+class ReviewAdmin(UserContentAdmin):
     list_display = ['title', 'movie', 'user_name', 'rating', 'created_at', 'helpful_count']
+    list_select_related = ['movie']
     search_fields = ['title', 'movie__title', 'user_name']
     list_filter = ['rating', 'created_at']
+    date_hierarchy = 'created_at'
+    autocomplete_fields = ['movie']
     readonly_fields = ['created_at', 'updated_at']
 
+    def get_queryset(self, request):
+        # Review.__str__ includes the movie title (used by the review autocomplete).
+        return super().get_queryset(request).select_related('movie')
+
 @admin.register(Rating)
-class RatingAdmin(admin.ModelAdmin):
+class RatingAdmin(UserContentAdmin):
     list_display = ['movie', 'user_name', 'rating', 'created_at']
+    list_select_related = ['movie']
     search_fields = ['movie__title', 'user_name']
     list_filter = ['rating', 'created_at']
+    date_hierarchy = 'created_at'
+    autocomplete_fields = ['movie']
     readonly_fields = ['created_at']
 
 @admin.register(Comment)
-class CommentAdmin(admin.ModelAdmin):
+class CommentAdmin(UserContentAdmin):
     list_display = ['user_name', 'movie', 'created_at']
+    list_select_related = ['movie']
     search_fields = ['user_name', 'movie__title', 'content']
     list_filter = ['created_at']
+    date_hierarchy = 'created_at'
+    autocomplete_fields = ['movie', 'review']
     readonly_fields = ['created_at', 'updated_at']
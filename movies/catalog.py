@@ -0,0 +1,312 @@
+"""
+In-process columnar snapshot of the movie catalog.
+
+Movie metadata (title, director, release year, rating) is small and
+read-mostly. When ``MOVIE_CATALOG_SNAPSHOT`` is enabled, the summary
+listing (``/api/v1/movies/?nested=false``) is answered from packed
+``array`` columns held in memory instead of querying the database and
+building model instances. Director names are interned and stored as
+integer codes.
+
+Every column also has a sorted index (see ``SortedIndex``), so a filter is
+a ``bisect`` range and an ordering is a walk of a precomputed sort order.
+Queries never scan every row unless they ask for every row.
+
+The snapshot is kept current in two ways:
+
+- ``Movie`` save and delete signals apply the row once the transaction
+  commits, so a process sees its own writes immediately.
+- At most every ``MOVIE_CATALOG_REFRESH_SECONDS`` a read checks the change
+  log for movie entries newer than the last one applied (the snapshot's
+  generation) and reloads just those rows. This picks up writes from other
+  processes and set-based deletes that send no signals.
+
+``python benchmarks/catalog_snapshot.py`` compares the snapshot with the
+equivalent database queries.
+"""
+import heapq
+import math
+import sys
+import threading
+import time
+from array import array
+from bisect import bisect_left, bisect_right
+from itertools import islice
+
+from django.conf import settings
+from django.db.models import Max
+
+from .models import Movie, ChangeLogEntry
+
+FIELDS = ('id', 'title', 'director', 'release_year', 'rating')
+
+# Filter lookups and orderings that query() can answer.
+LOOKUPS = ('release_year__gte', 'release_year__lte', 'director', 'rating__gte')
+
+ORDERINGS = ('id', 'title', 'release_year', 'rating')
+
+
+class SortedIndex:
+    """
+    Movie ids sorted by one column's value, ties broken by id.
+
+    ``values`` and ``ids`` are parallel sequences, so the rows in a value
+    range are one contiguous slice found with ``bisect``.
+    """
+
+    def __init__(self, values, ids):
+        self.values = values
+        self.ids = ids
+
+    @classmethod
+    def build(cls, column, ids):
+        order = sorted(range(len(ids)), key=lambda position: (column[position], ids[position]))
+        values = [column[position] for position in order]
+        if isinstance(column, array):
+            values = array(column.typecode, values)
+        return cls(values, array('q', (ids[position] for position in order)))
+
+    def _find(self, value, pk):
+        lo = bisect_left(self.values, value)
+        return bisect_left(self.ids, pk, lo, bisect_right(self.values, value, lo))
+
+    def insert(self, value, pk):
+        position = self._find(value, pk)
+        self.values.insert(position, value)
+        self.ids.insert(position, pk)
+
+    def remove(self, value, pk):
+        position = self._find(value, pk)
+        del self.values[position]
+        del self.ids[position]
+
+    def range(self, low=None, high=None):
+        """Return the ``(lo, hi)`` slice of the entries with ``low <= value <= high``."""
+        lo = 0 if low is None else bisect_left(self.values, low)
+        hi = len(self.values) if high is None else bisect_right(self.values, high, lo)
+        return lo, max(lo, hi)
+
+    def walk(self, lo, hi, descending=False):
+        """Yield the ids in ``[lo, hi)`` by value; descending keeps ties in id order."""
+        if not descending:
+            yield from self.ids[lo:hi]
+            return
+        values, ids = self.values, self.ids
+        end = hi
+        while end > lo:
+            start = bisect_left(values, values[end - 1], lo, end)
+            yield from ids[start:end]
+            end = start
+
+
+class CatalogSnapshot:
+    def __init__(self, refresh_seconds=1.0, max_catch_up=1000, clock=time.monotonic):
+        self.refresh_seconds = refresh_seconds
+        self.max_catch_up = max_catch_up
+        self.clock = clock
+        self.generation = None
+        self._checked = None
+        self._lock = threading.RLock()
+        self._clear()
+
+    def _clear(self):
+        self.ids = array('q')
+        self.years = array('q')
+        self.ratings = array('d')
+        self.director_codes = array('i')
+        self.titles = []
+        self.directors = []
+        self._director_codes = {}
+        self._positions = {}
+        self._build_indexes()
+
+    def _columns(self):
+        return {
+            'id': self.ids, 'title': self.titles, 'director': self.director_codes,
+            'release_year': self.years, 'rating': self.ratings,
+        }
+
+    def _build_indexes(self):
+        self._indexes = {name: SortedIndex.build(column, self.ids) for name, column in self._columns().items()}
+
+    def __len__(self):
+        return len(self.ids)
+
+    def _director_code(self, name):
+        code = self._director_codes.get(name)
+        if code is None:
+            name = sys.intern(name)
+            code = self._director_codes[name] = len(self.directors)
+            self.directors.append(name)
+        return code
+
+    def upsert(self, pk, title, director, release_year, rating):
+        """Insert or overwrite one movie's row."""
+        with self._lock:
+            self._upsert(pk, title, director, release_year, rating)
+
+    def _upsert(self, pk, title, director, release_year, rating, index=True):
+        row = {
+            'id': pk, 'title': title, 'director': self._director_code(director),
+            'release_year': release_year, 'rating': rating,
+        }
+        columns = self._columns()
+        for name, column in columns.items():
+            if isinstance(column, array):
+                # Raise for a value the column cannot hold before changing anything.
+                array(column.typecode, [row[name]])
+        position = self._positions.get(pk)
+        if position is None:
+            self._positions[pk] = len(self.ids)
+            for name, column in columns.items():
+                column.append(row[name])
+                if index:
+                    self._indexes[name].insert(row[name], pk)
+            return
+        for name, column in columns.items():
+            old = column[position]
+            if old != row[name]:
+                column[position] = row[name]
+                self._indexes[name].remove(old, pk)
+                self._indexes[name].insert(row[name], pk)
+
+    def remove(self, pk):
+        """Drop one movie's row by moving the last row into its place."""
+        with self._lock:
+            position = self._positions.pop(pk, None)
+            if position is None:
+                return
+            last = len(self.ids) - 1
+            for name, column in self._columns().items():
+                self._indexes[name].remove(column[position], pk)
+                if position != last:
+                    column[position] = column[last]
+                column.pop()
+            if position != last:
+                self._positions[self.ids[position]] = position
+
+    def load(self):
+        """Replace the snapshot with every movie in the database."""
+        with self._lock:
+            # Read the generation first: a write racing with the load is
+            # then re-applied by the next refresh, which is idempotent.
+            generation = ChangeLogEntry.objects.aggregate(seq=Max('seq'))['seq'] or 0
+            self._clear()
+            for row in Movie.objects.order_by('pk').values_list(*FIELDS).iterator():
+                self._upsert(*row, index=False)
+            # Sorting once is far cheaper than inserting row by row.
+            self._build_indexes()
+            self.generation = generation
+            self._checked = self.clock()
+
+    def refresh(self):
+        """Apply movie changes logged since the snapshot's generation."""
+        with self._lock:
+            if self.generation is None:
+                return self.load()
+            entries = list(
+                ChangeLogEntry.objects.filter(kind='movie', seq__gt=self.generation)
+                .order_by('seq').values_list('seq', 'object_id')[:self.max_catch_up + 1]
+            )
+            self._checked = self.clock()
+            if len(entries) > self.max_catch_up:
+                return self.load()
+            if not entries:
+                return
+            changed = {object_id for _, object_id in entries}
+            rows = {row[0]: row for row in Movie.objects.filter(pk__in=changed).values_list(*FIELDS)}
+            for pk in changed:
+                if pk in rows:
+                    self.upsert(*rows[pk])
+                else:
+                    self.remove(pk)
+            self.generation = entries[-1][0]
+
+    def refresh_if_due(self):
+        if self._checked is None or self.clock() - self._checked >= self.refresh_seconds:
+            self.refresh()
+
+    def query(self, release_year__gte=None, release_year__lte=None, director=None, rating__gte=None,
+              ordering='id', limit=None):
+        """
+        Filter and sort the snapshot.
+
+        Each filter narrows its column's index to one slice. When the
+        filters are expected to pass ``limit`` rows before the narrowest
+        slice would be exhausted, the index of the ordering column is
+        walked in order until ``limit`` rows match. Otherwise the narrowest
+        slice is checked against the other filters and sorted.
+
+        Args:
+            ordering: A name from ORDERINGS, prefixed with ``-`` for descending.
+            limit: Return only the first ``limit`` rows (top-N).
+
+        Returns:
+            list: Dicts with the keys in FIELDS, ties ordered by id.
+        """
+        self.refresh_if_due()
+        with self._lock:
+            bounds = {}
+            if director is not None:
+                code = self._director_codes.get(director)
+                if code is None:
+                    return []
+                bounds['director'] = (code, code)
+            if release_year__gte is not None or release_year__lte is not None:
+                bounds['release_year'] = (release_year__gte, release_year__lte)
+            if rating__gte is not None:
+                bounds['rating'] = (rating__gte, None)
+            slices = {name: self._indexes[name].range(*bound) for name, bound in bounds.items()}
+            if limit == 0 or any(lo == hi for lo, hi in slices.values()):
+                return []
+
+            descending = ordering.startswith('-')
+            field = ordering.lstrip('-')
+            total = len(self.ids)
+            narrowest = min(slices, key=lambda name: slices[name][1] - slices[name][0], default=field)
+            lo, hi = slices.get(narrowest, (0, total))
+            # Treating the filters as independent, an ordered walk visits
+            # about limit / selectivity rows before it has limit matches.
+            selectivity = math.prod((hi - lo) / total for lo, hi in slices.values())
+            if narrowest == field or limit is not None and limit / selectivity <= hi - lo:
+                ids = self._indexes[field].walk(*slices.get(field, (0, total)), descending)
+                if len(bounds) > (field in bounds):
+                    ids = (pk for pk in ids if self._matches(pk, bounds, skip=field))
+                ids = list(islice(ids, limit))
+            else:
+                ids = sorted(pk for pk in self._indexes[narrowest].ids[lo:hi] if self._matches(pk, bounds, narrowest))
+                column, positions = self._columns()[field], self._positions
+
+                def key(pk):
+                    return column[positions[pk]]
+                # ids is in id order and both sorts are stable, so ties stay in id order.
+                if limit is not None:
+                    pick = heapq.nlargest if descending else heapq.nsmallest
+                    ids = pick(limit, ids, key=key)
+                elif field != 'id' or descending:
+                    ids.sort(key=key, reverse=descending)
+            return [self._row(pk) for pk in ids]
+
+    def _matches(self, pk, bounds, skip):
+        position = self._positions[pk]
+        columns = self._columns()
+        for name, (low, high) in bounds.items():
+            if name == skip:
+                continue
+            value = columns[name][position]
+            if low is not None and value < low or high is not None and value > high:
+                return False
+        return True
+
+    def _row(self, pk):
+        position = self._positions[pk]
+        return {
+            'id': pk,
+            'title': self.titles[position],
+            'director': self.directors[self.director_codes[position]],
+            'release_year': self.years[position],
+            'rating': self.ratings[position],
+        }
+
+
+snapshot = CatalogSnapshot(refresh_seconds=getattr(settings, 'MOVIE_CATALOG_REFRESH_SECONDS', 1.0))
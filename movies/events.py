@@ -0,0 +1,181 @@
+"""
+In-process publish/subscribe for the live activity feed.
+
+Review, rating and comment writes are published from model signals once their
+transaction commits (see ``movies/signals.py``). Subscribers are served by the
+server-sent events view in ``movies/views.py``; delivering an event is an
+in-memory append, so idle subscribers cost no database queries.
+
+Event ids are change log sequence numbers (``ChangeLogEntry.seq``), which lets
+a client that fell too far behind continue from ``/api/v1/changes/?since=``.
+
+The broker only sees writes made by the current process. Run the ASGI server
+with a single worker process, or accept that subscribers only receive events
+from the worker they are connected to.
+"""
+import asyncio
+import json
+import threading
+from collections import deque
+from dataclasses import dataclass
+
+from django.conf import settings
+from django.db.models import Max
+
+from .models import ChangeLogEntry
+
+
+@dataclass(frozen=True)
+class Event:
+    id: int
+    kind: str
+    movie_id: int
+    data: dict
+
+    def encode(self):
+        """Return the event in ``text/event-stream`` wire format."""
+        payload = json.dumps(self.data, default=str)
+        return f"id: {self.id}\nevent: {self.kind}\ndata: {payload}\n\n"
+
+
+class Subscription:
+    """
+    A single subscriber's bounded event queue.
+
+    Events are appended from the publishing thread through the subscriber's
+    event loop. When the queue is full the subscription is marked as
+    overflowed instead of growing, and the stream is expected to close so the
+    client reconnects with ``Last-Event-ID``.
+    """
+
+    def __init__(self, loop, movie_id=None, maxsize=256):
+        self.loop = loop
+        self.movie_id = movie_id
+        self.maxsize = maxsize
+        self.overflowed = False
+        self._queue = deque()
+        self._ready = asyncio.Event()
+
+    def wants(self, event):
+        return self.movie_id is None or self.movie_id == event.movie_id
+
+    def push(self, event):
+        """Queue ``event``; must run on the subscriber's event loop."""
+        if len(self._queue) >= self.maxsize:
+            self.overflowed = True
+        else:
+            self._queue.append(event)
+        self._ready.set()
+
+    def replay(self, events):
+        """
+        Queue buffered events on resume, ignoring the queue bound.
+
+        Otherwise a long backlog would overflow straight away and the client
+        would reconnect with the same ``Last-Event-ID`` forever.
+        """
+        self._queue.extend(events)
+
+    async def get(self, timeout=None):
+        """
+        Wait for the next event.
+
+        Returns:
+            Event or None: The next event, or None if ``timeout`` elapsed or
+            the subscription overflowed.
+        """
+        if not self._queue and not self.overflowed:
+            self._ready.clear()
+            try:
+                await asyncio.wait_for(self._ready.wait(), timeout)
+            except asyncio.TimeoutError:
+                return None
+        if self.overflowed or not self._queue:
+            return None
+        return self._queue.popleft()
+
+
+class EventBroker:
+    """
+    Fan out published events to subscribers, keeping a bounded history.
+
+    The history ring buffer backs ``Last-Event-ID`` resume. ``floor`` is the
+    highest event id that can no longer be replayed; a client resuming from
+    an older id has missed events and must resynchronize. Until this process
+    publishes, nothing before the change log's current end can be replayed
+    (see ``load_floor``).
+    """
+
+    def __init__(self, history_size=1000, queue_size=256):
+        self.queue_size = queue_size
+        self._history = deque(maxlen=history_size)
+        self._subscribers = set()
+        self._lock = threading.Lock()
+        self.floor = None
+
+    def publish(self, event):
+        """Record ``event`` and deliver it to matching subscribers. Thread-safe."""
+        with self._lock:
+            if self.floor is None:
+                self.floor = event.id - 1
+            elif len(self._history) == self._history.maxlen:
+                self.floor = self._history[0].id
+            self._history.append(event)
+            subscribers = [s for s in self._subscribers if s.wants(event)]
+        for subscription in subscribers:
+            try:
+                subscription.loop.call_soon_threadsafe(subscription.push, event)
+            except RuntimeError:
+                # The subscriber's loop has shut down without unsubscribing.
+                self.unsubscribe(subscription)
+
+    def load_floor(self):
+        """
+        Set ``floor`` to the latest change log sequence if nothing was published yet.
+
+        A fresh broker (after a restart or deploy) has an empty history, so a
+        client resuming from before the current end of the log has missed
+        events even though this process never evicted them.
+        """
+        seq = ChangeLogEntry.objects.aggregate(seq=Max('seq'))['seq'] or 0
+        with self._lock:
+            if self.floor is None:
+                self.floor = seq
+
+    def subscribe(self, movie_id=None, last_event_id=None):
+        """
+        Register a subscriber on the running event loop.
+
+        Args:
+            movie_id: Only deliver events for this movie, if given.
+            last_event_id: Replay buffered events with a greater id.
+
+        Returns:
+            tuple: ``(subscription, missed)`` where ``missed`` is True if events
+            after ``last_event_id`` are no longer buffered.
+        """
+        subscription = Subscription(asyncio.get_running_loop(), movie_id, self.queue_size)
+        with self._lock:
+            missed = False
+            if last_event_id is not None:
+                missed = self.floor is not None and last_event_id < self.floor
+                subscription.replay(
+                    event for event in self._history
+                    if event.id > last_event_id and subscription.wants(event)
+                )
+            self._subscribers.add(subscription)
+        return subscription, missed
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            self._subscribers.discard(subscription)
+
+    @property
+    def subscriber_count(self):
+        return len(self._subscribers)
+
+
+broker = EventBroker(
+    history_size=getattr(settings, 'EVENTS_HISTORY_SIZE', 1000),
+    queue_size=getattr(settings, 'EVENTS_QUEUE_SIZE', 256),
+)
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+from movies.schema import schema_versions, write_schema
+
+
+class Command(BaseCommand):
+    help = "Prebuild the OpenAPI schema of each API version for the current code version."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--api-version', action='append', dest='versions',
+                            help="API version to build (repeatable; default: API_SCHEMA_VERSIONS).")
+
+    def handle(self, *args, **options):
+        for version in options['versions'] or schema_versions():
+            path = write_schema(version)
+            self.stdout.write(f"Wrote {version} schema to {path}")
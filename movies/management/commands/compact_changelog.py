@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+from movies.models import ChangeLogEntry
+
+
+class Command(BaseCommand):
+    help = "Remove change log entries superseded by a later entry for the same object."
+
+    def handle(self, *args, **options):
+        deleted = ChangeLogEntry.objects.compact()
+        self.stdout.write(f"Removed {deleted} superseded change log entries.")
@@ -0,0 +1,22 @@
+import datetime
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from movies.models import Rating
+
+
+class Command(BaseCommand):
+    help = "Archive raw ratings older than the retention window into the rating rollups."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--retention-days', type=int, default=None,
+                            help="Keep raw ratings this many days (default: RATING_RETENTION_DAYS).")
+
+    def handle(self, *args, **options):
+        days = options['retention_days']
+        if days is None:
+            days = getattr(settings, 'RATING_RETENTION_DAYS', 365)
+        cutoff = timezone.now() - datetime.timedelta(days=days)
+        archived = Rating.objects.filter(created_at__lt=cutoff).archive()
+        self.stdout.write(f"Archived {archived} ratings created before {cutoff:%Y-%m-%d}.")
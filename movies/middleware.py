@@ -0,0 +1,188 @@
+"""
+Load shedding for API routes.
+
+``LoadSheddingMiddleware`` puts every request through two gates before the
+view runs:
+
+1. A per-client token bucket; an empty bucket is rejected with 429.
+2. A concurrency limiter for the request's route class (e.g. heavy nested
+   listings vs. cheap single-row actions); a full limiter is rejected with
+   503. Limits adapt to observed latency using AIMD: each request finishing
+   within the class's target latency raises the limit by ``1/limit``, each
+   slow one multiplies it by ``backoff``.
+
+Both rejections carry ``Retry-After`` and are returned before any view or
+database work, so overload does not turn into unbounded worker queues.
+Configuration is read from the ``LOAD_SHEDDING`` setting; state is
+per-process.
+"""
+import math
+import threading
+import time
+from collections import OrderedDict
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.http import JsonResponse
+from django.urls import Resolver404, resolve
+
+DEFAULTS = {
+    'ROUTE_CLASSES': {},
+    'CONCURRENCY': {},
+    'DEFAULT_CONCURRENCY': {'initial': 64, 'min': 8, 'max': 256, 'target_latency': 1.0},
+    'BACKOFF': 0.9,
+    'CLIENT_RATE': 50,
+    'CLIENT_BURST': 100,
+    'MAX_TRACKED_CLIENTS': 10000,
+    'RETRY_AFTER': 1,
+}
+
+
+class AIMDLimiter:
+    """Concurrency limit adjusted by additive increase, multiplicative decrease."""
+
+    def __init__(self, initial, min, max, target_latency, backoff=0.9):
+        self.limit = float(initial)
+        self.min_limit = min
+        self.max_limit = max
+        self.target_latency = target_latency
+        self.backoff = backoff
+        self.inflight = 0
+        self._lock = threading.Lock()
+
+    def try_acquire(self):
+        """Take a slot if one is free under the current limit."""
+        with self._lock:
+            if self.inflight >= int(self.limit):
+                return False
+            self.inflight += 1
+            return True
+
+    def release(self, latency):
+        """Return a slot and adapt the limit to the request's latency (seconds)."""
+        with self._lock:
+            self.inflight -= 1
+            if latency > self.target_latency:
+                self.limit = max(self.min_limit, self.limit * self.backoff)
+            else:
+                self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+
+
+class TokenBucket:
+    def __init__(self, rate, burst, now):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = now
+
+    def take(self, now):
+        """
+        Consume one token.
+
+        Returns:
+            float: 0 if a token was taken, otherwise seconds until one is available.
+        """
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0
+        return (1 - self.tokens) / self.rate
+
+
+class ClientThrottle:
+    """Token buckets keyed by client, evicting the least recently seen client."""
+
+    def __init__(self, rate, burst, max_clients):
+        self.rate = rate
+        self.burst = burst
+        self.max_clients = max_clients
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def take(self, client, now=None):
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            bucket = self._buckets.get(client)
+            if bucket is None:
+                bucket = self._buckets[client] = TokenBucket(self.rate, self.burst, now)
+                if len(self._buckets) > self.max_clients:
+                    self._buckets.popitem(last=False)
+            else:
+                self._buckets.move_to_end(client)
+            return bucket.take(now)
+
+
+class LoadSheddingMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+        config = {**DEFAULTS, **getattr(settings, 'LOAD_SHEDDING', {})}
+        self.retry_after = config['RETRY_AFTER']
+        self.route_classes = {
+            url_name: route_class
+            for route_class, url_names in config['ROUTE_CLASSES'].items()
+            for url_name in url_names
+        }
+        self.limiters = {
+            route_class: AIMDLimiter(**config['CONCURRENCY'].get(route_class, config['DEFAULT_CONCURRENCY']),
+                                     backoff=config['BACKOFF'])
+            for route_class in [*config['ROUTE_CLASSES'], 'default']
+        }
+        self.throttle = ClientThrottle(config['CLIENT_RATE'], config['CLIENT_BURST'], config['MAX_TRACKED_CLIENTS'])
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        limiter, rejection = self.admit(request)
+        if rejection:
+            return rejection
+        start = time.monotonic()
+        try:
+            return self.get_response(request)
+        finally:
+            limiter.release(time.monotonic() - start)
+
+    async def __acall__(self, request):
+        limiter, rejection = self.admit(request)
+        if rejection:
+            return rejection
+        start = time.monotonic()
+        try:
+            return await self.get_response(request)
+        finally:
+            limiter.release(time.monotonic() - start)
+
+    def route_class(self, request):
+        try:
+            url_name = resolve(request.path_info).view_name
+        except Resolver404:
+            return 'default'
+        return self.route_classes.get(url_name, 'default')
+
+    def admit(self, request):
+        """
+        Apply the client throttle and the route class's concurrency limit.
+
+        Returns:
+            tuple: ``(limiter, None)`` with a slot held on ``limiter``, or
+            ``(None, response)`` with the rejection to send.
+        """
+        wait = self.throttle.take(request.META.get('REMOTE_ADDR', ''))
+        if wait:
+            return None, self.reject(429, "Request rate limit exceeded.", math.ceil(wait))
+        limiter = self.limiters[self.route_class(request)]
+        if not limiter.try_acquire():
+            return None, self.reject(503, "Server is busy, retry shortly.", self.retry_after)
+        return limiter, None
+
+    @staticmethod
+    def reject(status, detail, retry_after):
+        response = JsonResponse({'detail': detail}, status=status)
+        response['Retry-After'] = str(retry_after)
+        return response
@@ -0,0 +1,39 @@
+# Generated by Django 5.2.10 on 2026-10-19 08:19
+
+from django.db import migrations, models
+
+
+def log_existing_rows(apps, schema_editor):
+    """Write an upsert entry for every existing row so a sync from cursor 0 sees the whole catalog."""
+    ChangeLogEntry = apps.get_model('movies', 'ChangeLogEntry')
+    for model_name in ('movie', 'review', 'rating', 'comment'):
+        pks = apps.get_model('movies', model_name).objects.order_by('pk').values_list('pk', flat=True)
+        ChangeLogEntry.objects.bulk_create(
+            (ChangeLogEntry(kind=model_name, object_id=pk, op='upsert') for pk in pks.iterator()),
+            batch_size=500,
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('movies', '0004_rating_review_comment'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ChangeLogEntry',
+            fields=[
+                ('seq', models.BigAutoField(primary_key=True, serialize=False)),
+                ('kind', models.CharField(max_length=20)),
+                ('object_id', models.BigIntegerField()),
+                ('op', models.CharField(choices=[('upsert', 'Upsert'), ('delete', 'Delete')], max_length=6)),
+                ('changed_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'ordering': ['seq'],
+                'indexes': [models.Index(fields=['kind', 'object_id', 'seq'], name='changelog_object_idx')],
+            },
+        ),
+        migrations.RunPython(log_existing_rows, migrations.RunPython.noop),
+    ]
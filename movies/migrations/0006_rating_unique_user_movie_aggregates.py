@@ -0,0 +1,66 @@
+# Generated by Django 5.2.10 on 2026-10-19 08:23
+
+from django.db import migrations, models
+from django.db.models import Count, Exists, FloatField, OuterRef, Q, Subquery, Sum
+from django.db.models.functions import Cast
+
+
+def dedupe_ratings(apps, schema_editor):
+    """Keep only the latest rating per (movie, user_name), tombstoning the rest."""
+    Rating = apps.get_model('movies', 'Rating')
+    ChangeLogEntry = apps.get_model('movies', 'ChangeLogEntry')
+    newer = Rating.objects.filter(
+        movie=OuterRef('movie'), user_name=OuterRef('user_name'),
+    ).filter(
+        Q(created_at__gt=OuterRef('created_at')) | Q(created_at=OuterRef('created_at'), pk__gt=OuterRef('pk'))
+    )
+    superseded = Rating.objects.filter(Exists(newer))
+    ChangeLogEntry.objects.bulk_create(
+        [ChangeLogEntry(kind='rating', object_id=pk, op='delete') for pk in superseded.values_list('pk', flat=True)],
+        batch_size=500,
+    )
+    superseded.delete()
+
+
+def backfill_movie_aggregates(apps, schema_editor):
+    Movie = apps.get_model('movies', 'Movie')
+    Rating = apps.get_model('movies', 'Rating')
+    ratings = Rating.objects.filter(movie=OuterRef('pk')).order_by().values('movie')
+    count = Subquery(ratings.annotate(n=Count('pk')).values('n'))
+    total = Subquery(ratings.annotate(s=Sum('rating')).values('s'))
+    Movie.objects.filter(Exists(ratings)).update(
+        user_rating_count=count,
+        user_rating_sum=total,
+        average_user_rating=Cast(total, FloatField()) / count,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('movies', '0005_changelogentry'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='movie',
+            name='average_user_rating',
+            field=models.FloatField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='movie',
+            name='user_rating_count',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='movie',
+            name='user_rating_sum',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(dedupe_ratings, migrations.RunPython.noop),
+        migrations.RunPython(backfill_movie_aggregates, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='rating',
+            constraint=models.UniqueConstraint(fields=('movie', 'user_name'), name='unique_rating_per_movie_user'),
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 5.2.10 on 2026-10-19 08:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('movies', '0007_admin_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='movie',
+            index=models.Index(fields=['average_user_rating'], name='movie_avg_user_rating_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='review',
+            index=models.Index(fields=['movie', '-created_at'], name='review_movie_latest_idx'),
+        ),
+    ]
@@ -0,0 +1,61 @@
+# Generated by Django 5.2.10 on 2026-10-19 08:28
+
+import datetime
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count
+from django.db.models.functions import TruncDay
+
+
+def backfill_rollups(apps, schema_editor):
+    """Build day and month rollups from the existing ratings."""
+    Rating = apps.get_model('movies', 'Rating')
+    RatingRollup = apps.get_model('movies', 'RatingRollup')
+    rollups = {}
+    groups = Rating.objects.order_by().values(
+        'movie', 'rating', day=TruncDay('created_at', tzinfo=datetime.timezone.utc),
+    ).annotate(n=Count('pk'))
+    for group in groups:
+        day = group['day'].date()
+        for granularity, bucket in (('day', day), ('month', day.replace(day=1))):
+            rollup = rollups.setdefault(
+                (group['movie'], granularity, bucket),
+                RatingRollup(movie_id=group['movie'], granularity=granularity, bucket=bucket),
+            )
+            rollup.count += group['n']
+            rollup.total += group['n'] * group['rating']
+            stars = f"stars_{group['rating']}"
+            setattr(rollup, stars, getattr(rollup, stars) + group['n'])
+    RatingRollup.objects.bulk_create(rollups.values(), batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('movies', '0008_homepage_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RatingRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('granularity', models.CharField(choices=[('day', 'Day'), ('month', 'Month')], max_length=5)),
+                ('bucket', models.DateField()),
+                ('count', models.IntegerField(default=0)),
+                ('total', models.IntegerField(default=0)),
+                ('stars_1', models.IntegerField(default=0)),
+                ('stars_2', models.IntegerField(default=0)),
+                ('stars_3', models.IntegerField(default=0)),
+                ('stars_4', models.IntegerField(default=0)),
+                ('stars_5', models.IntegerField(default=0)),
+                ('movie', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='rating_rollups', to='movies.movie')),
+            ],
+            options={
+                'ordering': ['movie', 'granularity', 'bucket'],
+                'constraints': [models.UniqueConstraint(fields=('movie', 'granularity', 'bucket'), name='unique_rating_rollup_bucket')],
+            },
+        ),
+        migrations.RunPython(backfill_rollups, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.2.10 on 2026-10-19 08:29
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('movies', '0009_ratingrollup'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TrendingCounter',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('window', models.CharField(max_length=4)),
+                ('slot', models.BigIntegerField()),
+                ('count', models.FloatField(default=0)),
+                ('movie', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='trending_counters', to='movies.movie')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('window', 'slot', 'movie'), name='unique_trending_counter_slot')],
+            },
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 5.2.10 on 2026-10-19 08:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('movies', '0010_trendingcounter'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='movie',
+            index=models.Index(fields=['director'], name='movie_director_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='movie',
+            index=models.Index(fields=['rating'], name='movie_rating_idx'),
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.2.10 on 2026-10-19 08:47
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('movies', '0011_movie_filter_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedRating',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('user_name', models.CharField(max_length=100)),
+                ('rating', models.IntegerField()),
+                ('created_at', models.DateTimeField()),
+                ('movie', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archived_ratings', to='movies.movie')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('movie', 'user_name'), name='unique_archived_rating_per_movie_user')],
+            },
+        ),
+    ]
@@ -1,18 +1,192 @@
-from django.db import models
+import datetime
+
+from django.db import IntegrityError, connections, models, transaction
+from django.db.models import Case, Count, Exists, F, FloatField, OuterRef, Subquery, Sum, Value, When
+from django.db.models.functions import Cast, Coalesce, TruncDay
+from django.db.models.signals import post_save
 from django.core.validators import MinValueValidator, MaxValueValidator
+from django.utils import timezone
+
+from .pagination import forget_movie_count
+
+
+class BulkDeleteQuerySet(models.QuerySet):
+    def bulk_delete(self):
+        """
+        Delete these rows and their cascaded dependents with set-based SQL.
+
+        Unlike ``delete()``, no instances are loaded and no per-object signals
+        are sent: each affected table gets one ``INSERT ... SELECT`` of change
+        log tombstones (for tracked models) and one ``DELETE ... WHERE``
+        subquery, children first. Querysets can extend ``pre_bulk_delete``
+        to keep denormalized data in step.
+
+        Returns:
+            int: Total number of rows deleted across all tables.
+        """
+        with transaction.atomic(using=self.db):
+            return self._bulk_delete()
+
+    def _bulk_delete(self):
+        deleted = 0
+        for relation, related in self._related_querysets():
+            if relation.on_delete is models.CASCADE:
+                deleted += related._bulk_delete()
+            elif relation.on_delete is models.SET_NULL:
+                related.update(**{relation.field.name: None})
+            else:
+                raise NotImplementedError(f"bulk_delete does not support on_delete={relation.on_delete.__name__}")
+        self.pre_bulk_delete()
+        if self.model in CHANGE_TRACKED_MODELS:
+            self._write_tombstones()
+        return deleted + self.order_by()._raw_delete(self.db)
+
+    def _related_querysets(self):
+        """Yield ``(relation, queryset)`` for the rows referencing these rows, per reverse relation."""
+        doomed = self.order_by().values('pk')
+        for relation in self.model._meta.related_objects:
+            related = relation.related_model._default_manager.using(self.db).filter(
+                **{f'{relation.field.name}__in': doomed}
+            )
+            if not isinstance(related, BulkDeleteQuerySet):
+                related = BulkDeleteQuerySet(related.model, query=related.query, using=related.db)
+            yield relation, related
+
+    def cascade_counts(self):
+        """
+        Count the rows ``bulk_delete`` would delete, with one COUNT query per table.
+
+        Returns:
+            dict: Rows per model, including these rows' own model.
+        """
+        per_model = {}
+        for queryset in self._cascaded_querysets():
+            # A row reachable along several relations is counted once.
+            model = queryset.model
+            per_model[model] = per_model[model] | queryset if model in per_model else queryset
+        return {model: queryset.count() for model, queryset in per_model.items()}
+
+    def _cascaded_querysets(self):
+        yield self
+        for relation, related in self._related_querysets():
+            if relation.on_delete is models.CASCADE:
+                yield from related._cascaded_querysets()
+
+    def pre_bulk_delete(self):
+        """Hook run before this queryset's rows are deleted by ``bulk_delete``."""
+
+    def _write_tombstones(self):
+        connection = connections[self.db]
+        quote = connection.ops.quote_name
+        # Select the key under an explicit alias: the outer query cannot rely
+        # on the column name Django gives ``values('pk')``.
+        subquery, params = self.order_by().values(doomed_pk=F('pk')).query.sql_with_params()
+        sql = 'INSERT INTO {table} ({kind}, {object_id}, {op}, {changed_at}) SELECT %s, {pk}, %s, %s FROM ({subquery}) doomed'.format(
+            table=quote(ChangeLogEntry._meta.db_table),
+            kind=quote('kind'),
+            object_id=quote('object_id'),
+            op=quote('op'),
+            changed_at=quote('changed_at'),
+            pk=quote('doomed_pk'),
+            subquery=subquery,
+        )
+        with connection.cursor() as cursor:
+            cursor.execute(sql, [self.model._meta.model_name, ChangeLogEntry.DELETE, timezone.now(), *params])
+
+
+class MovieQuerySet(BulkDeleteQuerySet):
+    def _bulk_delete(self):
+        # The movies' rating aggregates and rollups are deleted with them, so
+        # their ratings skip RatingQuerySet.pre_bulk_delete's bookkeeping.
+        ratings = Rating.objects.using(self.db).filter(movie__in=self.order_by().values('pk'))
+        ratings._write_tombstones()
+        transaction.on_commit(forget_movie_count, using=self.db)
+        return ratings.order_by()._raw_delete(self.db) + super()._bulk_delete()
+
+    def apply_rating_delta(self, movie_id, count, total):
+        """
+        Adjust one movie's denormalized rating aggregates in a single UPDATE.
+
+        Args:
+            movie_id: The movie whose aggregates change
+            count: Change in the number of ratings
+            total: Change in the sum of rating values
+        """
+        new_count = F('user_rating_count') + count
+        new_sum = F('user_rating_sum') + total
+        return self.filter(pk=movie_id).update(
+            user_rating_count=new_count,
+            user_rating_sum=new_sum,
+            average_user_rating=Case(
+                When(user_rating_count__gt=-count, then=Cast(new_sum, FloatField()) / new_count),
+                default=Value(0.0),
+            ),
+        )
+
+    def refresh_rating_aggregates(self):
+        """
+        Recompute the rating aggregates of every movie in this queryset.
+
+        Totals are summed from the monthly rating rollups rather than the raw
+        ratings, since raw ratings past the retention window are archived
+        into the rollups (see ``RatingQuerySet.archive``).
+        """
+        rollups = RatingRollup.objects.filter(
+            movie=OuterRef('pk'), granularity=RatingRollup.MONTH,
+        ).order_by().values('movie')
+        count = Coalesce(Subquery(rollups.annotate(n=Sum('count')).values('n')), 0)
+        total = Coalesce(Subquery(rollups.annotate(s=Sum('total')).values('s')), 0)
+        return self.update(
+            user_rating_count=count,
+            user_rating_sum=total,
+            average_user_rating=Case(
+                When(Exists(rollups.filter(count__gt=0)), then=Cast(total, FloatField()) / count),
+                default=Value(0.0),
+            ),
+        )
+
 
 class Movie(models.Model):
     title = models.CharField(max_length=150)
     director = models.CharField(max_length=100)
     release_year = models.IntegerField()
     rating = models.FloatField()
+    # Denormalized from Rating; maintained by the rating signal receivers.
+    user_rating_count = models.IntegerField(default=0, editable=False)
+    user_rating_sum = models.IntegerField(default=0, editable=False)
+    average_user_rating = models.FloatField(default=0, editable=False)
+
+    objects = MovieQuerySet.as_manager()
 
     class Meta:
         unique_together = ['title', 'director', 'release_year']
+        indexes = [
+            models.Index(fields=['release_year'], name='movie_release_year_idx'),
+            models.Index(fields=['director'], name='movie_director_idx'),
+            models.Index(fields=['rating'], name='movie_rating_idx'),
+            models.Index(fields=['average_user_rating'], name='movie_avg_user_rating_idx'),
+        ]
+
+    RATING_AGGREGATE_FIELDS = ('user_rating_count', 'user_rating_sum', 'average_user_rating')
 
     def __str__(self):
         return f"{self.title} ({self.release_year})"
 
+    def save(self, *args, **kwargs):
+        """
+        Save the movie without writing back its rating aggregates.
+
+        The aggregates change only through ``apply_rating_delta`` and
+        ``refresh_rating_aggregates``; a full save of an instance loaded
+        before a rating was written would otherwise overwrite them.
+        """
+        if not self._state.adding and kwargs.get('update_fields') is None and not kwargs.get('force_insert'):
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in self.RATING_AGGREGATE_FIELDS
+            ]
+        super().save(*args, **kwargs)
+
 
 class Review(models.Model):
     movie = models.ForeignKey(Movie, on_delete=models.CASCADE, related_name='reviews')
@@ -24,26 +198,149 @@ class Review(models.Model):
     updated_at = models.DateTimeField(auto_now=True)
     helpful_count = models.IntegerField(default=0)
 
+    objects = BulkDeleteQuerySet.as_manager()
+
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['created_at'], name='review_created_at_idx'),
+            models.Index(fields=['movie', '-created_at'], name='review_movie_latest_idx'),
+            models.Index(fields=['user_name'], name='review_user_name_idx'),
+        ]
 
     def __str__(self):
         return f"{self.title} - {self.movie.title}"
 
 
+class RatingQuerySet(BulkDeleteQuerySet):
+    def upsert(self, movie, user_name, rating):
+        """
+        Create or replace ``user_name``'s rating of ``movie``.
+
+        The row is written with a single ``INSERT ... ON CONFLICT DO UPDATE``.
+        Because ``bulk_create`` skips model signals, ``post_save`` is sent
+        explicitly so the change log, live feed and movie aggregates see the
+        write exactly as they would a regular save.
+
+        Returns:
+            tuple: ``(rating, created)``
+        """
+        with transaction.atomic(using=self.db):
+            previous = self.filter(movie=movie, user_name=user_name).values_list('movie_id', 'rating', 'created_at').first()
+            created = previous is None
+            archived = None
+            if created:
+                previous = archived = ArchivedRating.objects.using(self.db).current(movie.pk, user_name)
+            obj = Rating(movie=movie, user_name=user_name, rating=rating)
+            self.bulk_create(
+                [obj],
+                update_conflicts=True,
+                unique_fields=['movie', 'user_name'],
+                update_fields=['rating', 'created_at'],
+            )
+            if obj.pk is None:
+                obj.pk = self.filter(movie=movie, user_name=user_name).values_list('pk', flat=True).get()
+            obj._previous_rating = previous
+            obj._replaces_archived = archived is not None
+            post_save.send(sender=Rating, instance=obj, created=created, update_fields=None, raw=False, using=self.db)
+        return obj, created
+
+    def pre_bulk_delete(self):
+        """Subtract the deleted ratings from their movies' aggregates and rollups."""
+        per_movie = self.order_by().values('movie').annotate(n=Count('pk'), total=Sum('rating'))
+        for row in per_movie:
+            Movie.objects.apply_rating_delta(row['movie'], -row['n'], -row['total'])
+        RatingRollup.objects.subtract_ratings(self)
+
+    def archive(self):
+        """
+        Delete these raw ratings, keeping them in the rollups and movie aggregates.
+
+        Used to enforce the raw rating retention window: trends and averages
+        still include archived ratings, while the rows themselves disappear
+        from the API (with change log tombstones). Each archived rating is
+        kept as an ``ArchivedRating`` so that the user's next rating of the
+        movie replaces it instead of being counted a second time.
+
+        Returns:
+            int: Number of ratings archived.
+        """
+        with transaction.atomic(using=self.db):
+            self._write_tombstones()
+            self._copy_to_archive()
+            return self.order_by()._raw_delete(self.db)
+
+    def _copy_to_archive(self):
+        connection = connections[self.db]
+        quote = connection.ops.quote_name
+        opts = ArchivedRating._meta
+        fields = ['movie', 'user_name', 'rating', 'created_at']
+        # Aliased for the same reason as in _write_tombstones.
+        subquery, params = self.order_by().values(
+            **{f'archived_{field}': F(field) for field in fields}
+        ).query.sql_with_params()
+        sql = 'INSERT INTO {table} ({columns}) SELECT {aliases} FROM ({subquery}) archived'.format(
+            table=quote(opts.db_table),
+            columns=', '.join(quote(opts.get_field(field).column) for field in fields),
+            aliases=', '.join(quote(f'archived_{field}') for field in fields),
+            subquery=subquery,
+        )
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+
+
 class Rating(models.Model):
     movie = models.ForeignKey(Movie, on_delete=models.CASCADE, related_name='user_ratings')
     user_name = models.CharField(max_length=100, default='Anonymous')
     rating = models.IntegerField(validators=[MinValueValidator(1), MaxValueValidator(5)])
     created_at = models.DateTimeField(auto_now_add=True)
 
+    objects = RatingQuerySet.as_manager()
+
     class Meta:
         ordering = ['-created_at']
+        constraints = [
+            models.UniqueConstraint(fields=['movie', 'user_name'], name='unique_rating_per_movie_user'),
+        ]
+        indexes = [
+            models.Index(fields=['created_at'], name='rating_created_at_idx'),
+            models.Index(fields=['user_name'], name='rating_user_name_idx'),
+        ]
 
     def __str__(self):
         return f"{self.user_name} rated {self.movie.title}"
 
 
+class ArchivedRatingQuerySet(BulkDeleteQuerySet):
+    def current(self, movie_id, user_name):
+        """Return the archived ``(movie_id, rating, created_at)`` of a user's rating of a movie, or None."""
+        return self.filter(movie_id=movie_id, user_name=user_name).values_list('movie_id', 'rating', 'created_at').first()
+
+
+class ArchivedRating(models.Model):
+    """
+    A user's rating of a movie whose raw row was archived (see ``RatingQuerySet.archive``).
+
+    Archived ratings stay counted in the movie's aggregates and rollups. When
+    the same user rates the movie again, the new rating replaces this one
+    like an update instead of being counted as another rating.
+    """
+    movie = models.ForeignKey(Movie, on_delete=models.CASCADE, related_name='archived_ratings')
+    user_name = models.CharField(max_length=100)
+    rating = models.IntegerField()
+    created_at = models.DateTimeField()
+
+    objects = ArchivedRatingQuerySet.as_manager()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['movie', 'user_name'], name='unique_archived_rating_per_movie_user'),
+        ]
+
+    def __str__(self):
+        return f"{self.user_name} rated {self.movie_id} (archived)"
+
+
 class Comment(models.Model):
     movie = models.ForeignKey(Movie, on_delete=models.CASCADE, related_name='comments')
     review = models.ForeignKey(Review, on_delete=models.CASCADE, related_name='comments', null=True, blank=True)
@@ -52,8 +349,196 @@ class Comment(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = BulkDeleteQuerySet.as_manager()
+
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['created_at'], name='comment_created_at_idx'),
+            models.Index(fields=['user_name'], name='comment_user_name_idx'),
+        ]
+
+    def __str__(self):
+        return f"Comment by {self.user_name} on {self.movie.title}"
+
+
+class ChangeLogQuerySet(models.QuerySet):
+    def record(self, instance, op):
+        """Append a change entry for ``instance`` and return it."""
+        return self.create(kind=instance._meta.model_name, object_id=instance.pk, op=op)
+
+    def compact(self):
+        """
+        Delete entries superseded by a later entry for the same object.
+
+        Only the newest entry per object is needed to bring a client up to
+        date, so compaction bounds the log by the number of distinct objects
+        rather than the number of writes.
+
+        Returns:
+            int: Number of entries removed.
+        """
+        superseded = ChangeLogEntry.objects.filter(
+            kind=OuterRef('kind'),
+            object_id=OuterRef('object_id'),
+            seq__gt=OuterRef('seq'),
+        )
+        deleted, _ = self.filter(Exists(superseded)).delete()
+        return deleted
+
+
+class ChangeLogEntry(models.Model):
+    """
+    Append-only log of writes to movies, reviews, ratings and comments.
+
+    ``seq`` is the monotonic change sequence used as the sync cursor by the
+    changes feed. Entries are written from model signals (see
+    ``movies/signals.py``).
+    """
+    UPSERT = 'upsert'
+    DELETE = 'delete'
+    OP_CHOICES = [(UPSERT, 'Upsert'), (DELETE, 'Delete')]
+
+    seq = models.BigAutoField(primary_key=True)
+    kind = models.CharField(max_length=20)
+    object_id = models.BigIntegerField()
+    op = models.CharField(max_length=6, choices=OP_CHOICES)
+    changed_at = models.DateTimeField(auto_now_add=True)
+
+    objects = ChangeLogQuerySet.as_manager()
+
+    class Meta:
+        ordering = ['seq']
+        indexes = [
+            models.Index(fields=['kind', 'object_id', 'seq'], name='changelog_object_idx'),
+        ]
+
+    def __str__(self):
+        return f"#{self.seq} {self.op} {self.kind} {self.object_id}"
+
+
+class RatingRollupQuerySet(BulkDeleteQuerySet):
+    def add_ratings(self, movie_id, rated_at, rating, n=1):
+        """
+        Add ``n`` ratings of value ``rating`` at ``rated_at`` to the day and month buckets.
+
+        A negative ``n`` removes ratings. Each bucket is updated in place with
+        ``F()`` expressions and created on first use. Removing from a missing
+        bucket is a no-op, e.g. when the movie's rollups were already deleted
+        along with the movie.
+        """
+        for granularity in (RatingRollup.DAY, RatingRollup.MONTH):
+            bucket = RatingRollup.bucket_for(rated_at, granularity)
+            changes = {
+                'count': F('count') + n,
+                'total': F('total') + n * rating,
+                f'stars_{rating}': F(f'stars_{rating}') + n,
+            }
+            rollup = self.filter(movie_id=movie_id, granularity=granularity, bucket=bucket)
+            if rollup.update(**changes) or n < 0:
+                continue
+            try:
+                with transaction.atomic(using=self.db):
+                    self.create(movie_id=movie_id, granularity=granularity, bucket=bucket,
+                                count=n, total=n * rating, **{f'stars_{rating}': n})
+            except IntegrityError:
+                rollup.update(**changes)
+
+    def subtract_ratings(self, ratings):
+        """Remove a queryset of ratings from the rollups, one update per day bucket and value."""
+        groups = ratings.order_by().values(
+            'movie', 'rating', day=TruncDay('created_at', tzinfo=datetime.timezone.utc),
+        ).annotate(n=Count('pk'))
+        for group in groups:
+            self.add_ratings(group['movie'], group['day'], group['rating'], -group['n'])
+
+
+class RatingRollup(models.Model):
+    """
+    Per-movie rating totals for one day or month.
+
+    Maintained incrementally from rating writes (see ``movies/signals.py``)
+    so rating trends are read from O(buckets) rows instead of scanning
+    ``Rating``. Raw ratings older than the retention window are archived
+    into these rollups by ``manage.py compact_ratings``.
+    """
+    DAY = 'day'
+    MONTH = 'month'
+    GRANULARITY_CHOICES = [(DAY, 'Day'), (MONTH, 'Month')]
+
+    movie = models.ForeignKey(Movie, on_delete=models.CASCADE, related_name='rating_rollups')
+    granularity = models.CharField(max_length=5, choices=GRANULARITY_CHOICES)
+    bucket = models.DateField()
+    count = models.IntegerField(default=0)
+    total = models.IntegerField(default=0)
+    stars_1 = models.IntegerField(default=0)
+    stars_2 = models.IntegerField(default=0)
+    stars_3 = models.IntegerField(default=0)
+    stars_4 = models.IntegerField(default=0)
+    stars_5 = models.IntegerField(default=0)
+
+    objects = RatingRollupQuerySet.as_manager()
+
+    class Meta:
+        ordering = ['movie', 'granularity', 'bucket']
+        constraints = [
+            models.UniqueConstraint(fields=['movie', 'granularity', 'bucket'], name='unique_rating_rollup_bucket'),
+        ]
+
+    def __str__(self):
+        return f"{self.movie_id} {self.granularity} {self.bucket}: {self.count} ratings"
+
+    @classmethod
+    def bucket_for(cls, moment, granularity):
+        """Return the first day (UTC) of the bucket containing ``moment``."""
+        day = moment.astimezone(datetime.timezone.utc).date() if isinstance(moment, datetime.datetime) else moment
+        return day.replace(day=1) if granularity == cls.MONTH else day
+
+    @property
+    def average(self):
+        return self.total / self.count if self.count else 0
+
+    @property
+    def histogram(self):
+        return {stars: getattr(self, f'stars_{stars}') for stars in range(1, 6)}
+
+
+class TrendingCounterQuerySet(BulkDeleteQuerySet):
+    def add(self, movie_id, window, slot, delta):
+        """Add ``delta`` to one checkpointed slot, creating it on first use."""
+        counter = self.filter(movie_id=movie_id, window=window, slot=slot)
+        if counter.update(count=F('count') + delta):
+            return
+        try:
+            with transaction.atomic(using=self.db):
+                self.create(movie_id=movie_id, window=window, slot=slot, count=delta)
+        except IntegrityError:
+            counter.update(count=F('count') + delta)
+
+
+class TrendingCounter(models.Model):
+    """
+    Checkpoint of one time slot of a movie's trending activity counter.
+
+    Worker processes add their in-memory increments here and reload the
+    merged totals (see ``movies/trending.py``). ``slot`` is the slot number
+    since the Unix epoch for the window's slot length.
+    """
+    movie = models.ForeignKey(Movie, on_delete=models.CASCADE, related_name='trending_counters')
+    window = models.CharField(max_length=4)
+    slot = models.BigIntegerField()
+    count = models.FloatField(default=0)
+
+    objects = TrendingCounterQuerySet.as_manager()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['window', 'slot', 'movie'], name='unique_trending_counter_slot'),
+        ]
 
     def __str__(self):
-        return f"Comment by {self.user_name} on {self.movie.title}"
\ No newline at end of file
+        return f"{self.movie_id} {self.window} slot {self.slot}: {self.count}"
+
+
+# Models whose writes are recorded in the change log.
+CHANGE_TRACKED_MODELS = (Movie, Review, Rating, Comment)
@@ -0,0 +1,75 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.core.paginator import Paginator
+from django.db import connections
+from django.utils.functional import cached_property
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Paginator that estimates the row count of unfiltered querysets.
+
+    An exact ``COUNT(*)`` scans the whole table, which dominates page
+    load time once a table has millions of rows. When the queryset is not
+    filtered and the estimate exceeds ``ESTIMATED_COUNT_THRESHOLD``,
+    the estimate is used instead; filtered querysets are still counted exactly.
+    """
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if not queryset.query.where:
+            estimate = estimate_row_count(queryset.model, queryset.db)
+            if estimate is not None and estimate > getattr(settings, 'ESTIMATED_COUNT_THRESHOLD', 10000):
+                return estimate
+        return super().count
+
+
+def estimate_row_count(model, using):
+    """
+    Return a cheap estimate of ``model``'s row count, or None if unavailable.
+
+    PostgreSQL reads the planner statistics; SQLite uses the largest primary
+    key, an index lookup that over-counts only by the number of deleted rows.
+    """
+    connection = connections[using]
+    table = model._meta.db_table
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            cursor.execute("SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass", [table])
+        elif connection.vendor == 'sqlite':
+            pk = connection.ops.quote_name(model._meta.pk.column)
+            cursor.execute(f"SELECT MAX({pk}) FROM {connection.ops.quote_name(table)}")
+        else:
+            return None
+        row = cursor.fetchone()
+    return row[0] if row and row[0] is not None and row[0] >= 0 else None
+
+
+# Cached exact movie count behind the homepage total and page links.
+MOVIE_COUNT_CACHE_KEY = 'movies:movie-count'
+
+
+class CachedCountPaginator(Paginator):
+    """
+    Paginator whose exact count is cached for ``timeout`` seconds.
+
+    For counts shown to users, where an estimate would be wrong by every
+    deleted row, but a ``COUNT(*)`` per page view is too slow on a large
+    table. Writes that change the count delete ``cache_key``; other
+    processes see the change within ``timeout``.
+    """
+
+    def __init__(self, object_list, per_page, cache_key, timeout, **kwargs):
+        super().__init__(object_list, per_page, **kwargs)
+        self.cache_key = cache_key
+        self.timeout = timeout
+
+    @cached_property
+    def count(self):
+        return cache.get_or_set(self.cache_key, lambda: Paginator.count.func(self), self.timeout)
+
+
+def forget_movie_count():
+    """Drop the cached movie count after movies were created or deleted."""
+    cache.delete(MOVIE_COUNT_CACHE_KEY)
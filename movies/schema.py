@@ -0,0 +1,161 @@
+"""
+Precomputed OpenAPI schema.
+
+drf-spectacular introspects every viewset and serializer to build the schema,
+which is far too slow to repeat per request. Here the schema for each API
+version is built once per code version and kept in memory: from a file
+written by ``manage.py build_schema`` if one exists, otherwise generated.
+With ``API_SCHEMA_WARM_ON_STARTUP`` the WSGI and ASGI entry points fill the
+cache before serving (see ``warm_up``), so no request waits for it; without
+it, the first schema request does.
+
+The code version is the ``API_CODE_VERSION`` setting, or a hash of the
+project's Python sources and the drf-spectacular version, so a deploy with
+changed code never serves a stale schema.
+"""
+import hashlib
+import json
+import threading
+from dataclasses import dataclass
+from functools import lru_cache
+from pathlib import Path
+
+from django.conf import settings
+from django.utils.cache import get_conditional_response
+from django.http import HttpResponse, Http404
+from django.views import View
+
+JSON_MEDIA_TYPE = 'application/vnd.oai.openapi+json'
+YAML_MEDIA_TYPE = 'application/vnd.oai.openapi'
+
+
+@dataclass(frozen=True)
+class RenderedSchema:
+    body: bytes
+    media_type: str
+
+    @property
+    def etag(self):
+        return '"%s"' % hashlib.sha256(self.body).hexdigest()
+
+
+@lru_cache(maxsize=None)
+def code_version():
+    """Return the identifier of the running code that schemas are keyed by."""
+    configured = getattr(settings, 'API_CODE_VERSION', None)
+    if configured:
+        return configured
+    import drf_spectacular
+
+    digest = hashlib.sha256(drf_spectacular.__version__.encode())
+    base_dir = Path(settings.BASE_DIR)
+    for package in ('movie', 'movies'):
+        for path in sorted((base_dir / package).rglob('*.py')):
+            if 'migrations' in path.parts or path.name.startswith('test'):
+                continue
+            digest.update(str(path.relative_to(base_dir)).encode())
+            digest.update(path.read_bytes())
+    return digest.hexdigest()[:16]
+
+
+def schema_versions():
+    return getattr(settings, 'API_SCHEMA_VERSIONS', ['v1'])
+
+
+def schema_path(version):
+    """Return the prebuilt schema file for ``version`` at the current code version."""
+    schema_dir = Path(getattr(settings, 'API_SCHEMA_DIR', Path(settings.BASE_DIR) / 'schema'))
+    return schema_dir / f'openapi-{version}-{code_version()}.json'
+
+
+def generate_schema(version):
+    """Introspect the API with drf-spectacular and return the schema as JSON bytes."""
+    from drf_spectacular.generators import SchemaGenerator
+    from drf_spectacular.renderers import OpenApiJsonRenderer
+
+    schema = SchemaGenerator(api_version=version).get_schema(request=None, public=True)
+    return OpenApiJsonRenderer().render(schema)
+
+
+def write_schema(version):
+    """Generate the schema for ``version`` and write it to :func:`schema_path`."""
+    path = schema_path(version)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(generate_schema(version))
+    return path
+
+
+class SchemaCache:
+    """Rendered schemas keyed by (code version, API version, media type)."""
+
+    def __init__(self):
+        self._schemas = {}
+        # Re-entrant: rendering YAML looks up the cached JSON schema.
+        self._lock = threading.RLock()
+
+    def get(self, version, media_type=JSON_MEDIA_TYPE):
+        key = (code_version(), version, media_type)
+        schema = self._schemas.get(key)
+        if schema is None:
+            with self._lock:
+                schema = self._schemas.get(key)
+                if schema is None:
+                    schema = self._schemas[key] = self._render(version, media_type)
+        return schema
+
+    def _render(self, version, media_type):
+        if media_type == YAML_MEDIA_TYPE:
+            from drf_spectacular.renderers import OpenApiYamlRenderer
+
+            data = json.loads(self.get(version, JSON_MEDIA_TYPE).body)
+            return RenderedSchema(OpenApiYamlRenderer().render(data), YAML_MEDIA_TYPE)
+        path = schema_path(version)
+        body = path.read_bytes() if path.exists() else generate_schema(version)
+        return RenderedSchema(body, JSON_MEDIA_TYPE)
+
+    def clear(self):
+        with self._lock:
+            self._schemas.clear()
+
+
+schema_cache = SchemaCache()
+
+
+def warm_up():
+    """Load or generate the JSON schema of every API version if ``API_SCHEMA_WARM_ON_STARTUP`` is set."""
+    if getattr(settings, 'API_SCHEMA_WARM_ON_STARTUP', False):
+        for version in schema_versions():
+            schema_cache.get(version)
+
+
+class CachedSchemaView(View):
+    """
+    Serve the precomputed OpenAPI schema.
+
+    GET /api/schema/?version=v1&format=json|yaml
+
+    Without ``format``, JSON is returned when the ``Accept`` header asks for
+    JSON and YAML otherwise, matching drf-spectacular's schema view. Responses
+    carry an ETag so pollers can revalidate with ``If-None-Match`` and get a
+    304 without a body.
+    """
+
+    def get(self, request, *args, **kwargs):
+        versions = schema_versions()
+        version = request.GET.get('version') or versions[0]
+        if version not in versions:
+            raise Http404("Unknown API version.")
+        schema = schema_cache.get(version, self.media_type(request))
+        response = get_conditional_response(request, etag=schema.etag)
+        if response is None:
+            response = HttpResponse(schema.body, content_type=schema.media_type)
+        response['ETag'] = schema.etag
+        response['Cache-Control'] = 'no-cache'
+        return response
+
+    @staticmethod
+    def media_type(request):
+        requested = request.GET.get('format')
+        if requested:
+            return JSON_MEDIA_TYPE if requested in ('json', 'openapi-json') else YAML_MEDIA_TYPE
+        return JSON_MEDIA_TYPE if 'json' in request.headers.get('Accept', '') else YAML_MEDIA_TYPE
@@ -1,6 +1,6 @@
 from rest_framework import serializers
 from datetime import datetime
-from .models import Movie, Review, Rating, Comment
+from .models import Movie, Review, Rating, Comment, RatingRollup
 
 class CommentSerializer(serializers.ModelSerializer):
     """
@@ -80,6 +80,24 @@ class RatingSerializer(serializers.ModelSerializer):
         return value
 
 
+class RatingUpsertSerializer(RatingSerializer):
+    """
+    Input serializer for a user's own rating of a movie (PUT my_rating).
+
+    Fields:
+        - user_name: Name of the user who rated
+        - rating: Rating 1-5 (validated)
+
+    The movie comes from the URL and an existing rating is replaced, so the
+    uniqueness validator of RatingSerializer does not apply. ``user_name`` is
+    required: it identifies whose rating is replaced.
+    """
+    class Meta(RatingSerializer.Meta):
+        fields = ['user_name', 'rating']
+        validators = []
+        extra_kwargs = {'user_name': {'required': True}}
+
+
 class MovieSerializer(serializers.ModelSerializer):
     """
     Serializer for Movie model with nested reviews and ratings.
@@ -92,7 +110,7 @@ class MovieSerializer(serializers.ModelSerializer):
         - rating: Movie rating 1-5 (validated)
         - reviews (read-only, nested): Related reviews for this movie
         - user_ratings (read-only, nested): Related user ratings for this movie
-        - average_user_rating (read-only, calculated): Average of all user ratings
+        - average_user_rating (read-only): Average of all user ratings, kept up to date on rating writes
         
     Validations:
         - rating must be between 1 and 5
@@ -119,9 +137,9 @@ class MovieSerializer(serializers.ModelSerializer):
             raise serializers.ValidationError("Release year cannot exceed current year.")
         return value
 
-    def get_average_user_rating(self, obj):
+    def get_average_user_rating(self, obj) -> float:
         """
-        Calculate the average rating from all user ratings for this movie.
+        Return the average rating from all user ratings for this movie.
         
         Args:
             obj: The Movie instance
@@ -129,7 +147,50 @@ class MovieSerializer(serializers.ModelSerializer):
         Returns:
             float: Average rating, or 0 if no ratings exist
         """
-        ratings = obj.user_ratings.all()
-        if ratings.exists():
-            return sum(r.rating for r in ratings) / ratings.count()
-        return 0
\ No newline at end of file
+        return obj.average_user_rating
+
+
+class ReviewSummarySerializer(ReviewSerializer):
+    """
+    Review serializer without nested comments.
+
+    Used where reviews are emitted in bulk (e.g. the changes feed) and the
+    comments are delivered as their own rows.
+    """
+    comments = None
+
+    class Meta(ReviewSerializer.Meta):
+        fields = ['id', 'movie', 'user_name', 'title', 'content', 'rating', 'created_at', 'updated_at', 'helpful_count']
+
+
+class MovieSummarySerializer(MovieSerializer):
+    """
+    Movie serializer with only the movie's own columns.
+
+    Omits the nested reviews, ratings and computed average so a row can be
+    serialized without touching related tables.
+    """
+    reviews = None
+    user_ratings = None
+    average_user_rating = None
+
+    class Meta(MovieSerializer.Meta):
+        fields = ['id', 'title', 'director', 'release_year', 'rating']
+
+
+class RatingRollupSerializer(serializers.ModelSerializer):
+    """
+    Serializer for one bucket of a movie's rating trend.
+
+    Fields:
+        - bucket: First day of the day or month bucket
+        - count: Number of ratings in the bucket
+        - average: Average rating in the bucket
+        - histogram: Number of ratings per star value (1-5)
+    """
+    average = serializers.FloatField(read_only=True)
+    histogram = serializers.DictField(child=serializers.IntegerField(), read_only=True)
+
+    class Meta:
+        model = RatingRollup
+        fields = ['bucket', 'count', 'average', 'histogram']
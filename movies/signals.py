@@ -0,0 +1,144 @@
+"""
+Signal receivers that keep derived state in step with model writes.
+
+Receivers are connected when the app registry is ready (see
+``MoviesConfig.ready``).
+"""
+from django.db import transaction
+from django.db.models.signals import pre_save, post_save, post_delete
+from django.dispatch import receiver
+from . import catalog, events, trending
+from .models import (
+    Movie, Review, Rating, ArchivedRating, Comment, ChangeLogEntry, RatingRollup, CHANGE_TRACKED_MODELS,
+)
+from .pagination import forget_movie_count
+from .serializers import ReviewSummarySerializer, RatingSerializer, CommentSerializer
+
+LIVE_FEED_SERIALIZERS = {
+    Review: ReviewSummarySerializer,
+    Rating: RatingSerializer,
+    Comment: CommentSerializer,
+}
+
+TRENDING_ACTIVITIES = {
+    Review: 'review',
+    Rating: 'rating',
+    Comment: 'comment',
+}
+
+
+def record_upsert(sender, instance, **kwargs):
+    """Log creates and updates of tracked models to the change log."""
+    entry = ChangeLogEntry.objects.record(instance, ChangeLogEntry.UPSERT)
+    if sender in LIVE_FEED_SERIALIZERS:
+        publish_live_event(entry, instance)
+
+
+@receiver(post_save, dispatch_uid='movies.count_trending_activity')
+def count_trending_activity(sender, instance, created, raw=False, **kwargs):
+    """Count a new review, rating or comment towards its movie's trending score once committed."""
+    if created and not raw and sender in TRENDING_ACTIVITIES:
+        movie_id, activity = instance.movie_id, TRENDING_ACTIVITIES[sender]
+        transaction.on_commit(lambda: trending.tracker.record(movie_id, activity))
+
+
+def record_delete(sender, instance, **kwargs):
+    """
+    Log a tombstone for a deleted tracked model.
+
+    Cascaded deletes go through the collector, which sends ``post_delete``
+    for each related row, so they are tombstoned as well.
+    """
+    ChangeLogEntry.objects.record(instance, ChangeLogEntry.DELETE)
+
+
+# Connected per tracked model rather than for every sender: a post_delete
+# listener on a model disables Django's fast (single query) delete for it,
+# which the change log and counter tables rely on.
+for model in CHANGE_TRACKED_MODELS:
+    post_save.connect(record_upsert, sender=model, dispatch_uid=f'movies.record_upsert.{model._meta.model_name}')
+    post_delete.connect(record_delete, sender=model, dispatch_uid=f'movies.record_delete.{model._meta.model_name}')
+
+
+def publish_live_event(entry, instance):
+    """Publish ``instance`` to the live feed once the current transaction commits."""
+    event = events.Event(
+        id=entry.seq,
+        kind=entry.kind,
+        movie_id=instance.movie_id,
+        data=LIVE_FEED_SERIALIZERS[type(instance)](instance).data,
+    )
+    transaction.on_commit(lambda: events.broker.publish(event))
+
+
+@receiver(post_save, sender=Movie, dispatch_uid='movies.movie_count_changed_on_save')
+@receiver(post_delete, sender=Movie, dispatch_uid='movies.movie_count_changed_on_delete')
+def movie_count_changed(sender, instance, created=True, raw=False, **kwargs):
+    """Drop the cached movie count once a movie is created or deleted."""
+    if created and not raw:
+        transaction.on_commit(forget_movie_count)
+
+
+@receiver(post_save, sender=Movie, dispatch_uid='movies.catalog_movie_saved')
+def catalog_movie_saved(sender, instance, raw=False, **kwargs):
+    """Apply a saved movie to a loaded catalog snapshot once committed."""
+    if raw or catalog.snapshot.generation is None:
+        return
+    row = tuple(getattr(instance, 'pk' if field == 'id' else field) for field in catalog.FIELDS)
+    transaction.on_commit(lambda: catalog.snapshot.upsert(*row))
+
+
+@receiver(post_delete, sender=Movie, dispatch_uid='movies.catalog_movie_deleted')
+def catalog_movie_deleted(sender, instance, **kwargs):
+    """Drop a deleted movie from a loaded catalog snapshot once committed."""
+    if catalog.snapshot.generation is None:
+        return
+    pk = instance.pk
+    transaction.on_commit(lambda: catalog.snapshot.remove(pk))
+
+
+@receiver(pre_save, sender=Rating, dispatch_uid='movies.remember_previous_rating')
+def remember_previous_rating(sender, instance, raw=False, **kwargs):
+    """
+    Stash the stored (movie_id, rating, created_at) of an updated rating for the aggregate delta.
+
+    A new rating by a user whose earlier rating of the movie was archived
+    replaces the archived one.
+    """
+    instance._previous_rating = None
+    instance._replaces_archived = False
+    if raw:
+        return
+    if instance._state.adding:
+        instance._previous_rating = ArchivedRating.objects.current(instance.movie_id, instance.user_name)
+        instance._replaces_archived = instance._previous_rating is not None
+    else:
+        instance._previous_rating = (
+            Rating.objects.filter(pk=instance.pk).values_list('movie_id', 'rating', 'created_at').first()
+        )
+
+
+@receiver(post_save, sender=Rating, dispatch_uid='movies.rating_saved')
+def rating_saved(sender, instance, created, raw=False, **kwargs):
+    """Fold a created or updated rating into its movie's aggregates and rollups."""
+    if raw:
+        return
+    previous = getattr(instance, '_previous_rating', None)
+    if getattr(instance, '_replaces_archived', False):
+        ArchivedRating.objects.filter(movie_id=instance.movie_id, user_name=instance.user_name).delete()
+    if previous:
+        movie_id, rating, created_at = previous
+        RatingRollup.objects.add_ratings(movie_id, created_at, rating, -1)
+    RatingRollup.objects.add_ratings(instance.movie_id, instance.created_at, instance.rating)
+    if previous and previous[0] == instance.movie_id:
+        Movie.objects.apply_rating_delta(instance.movie_id, 0, instance.rating - previous[1])
+        return
+    if previous:
+        Movie.objects.apply_rating_delta(previous[0], -1, -previous[1])
+    Movie.objects.apply_rating_delta(instance.movie_id, 1, instance.rating)
+
+
+@receiver(post_delete, sender=Rating, dispatch_uid='movies.rating_deleted')
+def rating_deleted(sender, instance, **kwargs):
+    Movie.objects.apply_rating_delta(instance.movie_id, -1, -instance.rating)
+    RatingRollup.objects.add_ratings(instance.movie_id, instance.created_at, instance.rating, -1)
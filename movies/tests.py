@@ -1,7 +1,28 @@
+import asyncio
+import importlib
+import os
+import datetime
+import tempfile
+import threading
+from unittest import mock
 from rest_framework.test import APITestCase
+from django.http import HttpResponse
+from django.apps import apps as django_apps
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import DatabaseError, connection, transaction
+from django.db.models import Sum
+from django.db.models.deletion import Collector
+from django.test import AsyncRequestFactory, RequestFactory, SimpleTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from rest_framework import status
-from .models import Movie, Review, Rating, Comment
+from . import catalog, events, schema, trending
+from .models import Movie, Review, Rating, ArchivedRating, Comment, ChangeLogEntry, RatingRollup, TrendingCounter
+from .pagination import MOVIE_COUNT_CACHE_KEY, forget_movie_count
+from .middleware import AIMDLimiter, ClientThrottle, LoadSheddingMiddleware
+from .views import live_events
 
 class MovieAPITest(APITestCase):
     """Test CRUD operations and validation for Movie endpoints."""
@@ -261,4 +282,1145 @@ class CommentAPITest(APITestCase):
         url = reverse('comment-list', kwargs={'version': 'v1'})
         response = self.client.get(url, {'review_id': self.review.id})
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(response.data), 1)
\ No newline at end of file
+        self.assertEqual(len(response.data), 1)
+
+
+class ChangeFeedAPITest(APITestCase):
+    """Test the incremental changes feed and change log compaction."""
+
+    def setUp(self):
+        """Create a movie with a review and a comment on that review."""
+        self.movie = Movie.objects.create(
+            title="Test Movie",
+            director="Test Director",
+            release_year=2020,
+            rating=4.0
+        )
+        self.review = Review.objects.create(
+            movie=self.movie,
+            user_name="Reviewer",
+            title="Review",
+            content="Review content",
+            rating=4
+        )
+        self.comment = Comment.objects.create(
+            movie=self.movie, review=self.review, user_name="User1", content="Comment"
+        )
+        self.url = reverse('change-list', kwargs={'version': 'v1'})
+
+    def test_changes_since_zero_returns_upserts_in_order(self):
+        """Test that a full sync returns every row as an upsert in sequence order."""
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        changes = response.data['changes']
+        self.assertEqual([c['kind'] for c in changes], ['movie', 'review', 'comment'])
+        self.assertTrue(all(c['op'] == 'upsert' for c in changes))
+        self.assertEqual(changes[0]['data']['title'], "Test Movie")
+        self.assertNotIn('comments', changes[1]['data'])
+        self.assertEqual(response.data['next_cursor'], changes[-1]['seq'])
+
+    def test_changes_since_cursor_returns_only_deltas(self):
+        """Test that only changes after the cursor are returned."""
+        cursor = self.client.get(self.url).data['next_cursor']
+        Rating.objects.create(movie=self.movie, user_name="Rater", rating=5)
+        response = self.client.get(self.url, {'since': cursor})
+        self.assertEqual(len(response.data['changes']), 1)
+        self.assertEqual(response.data['changes'][0]['kind'], 'rating')
+
+    def test_cascaded_delete_emits_tombstones(self):
+        """Test that deleting a movie tombstones its cascaded reviews and comments."""
+        cursor = self.client.get(self.url).data['next_cursor']
+        movie_id = self.movie.id
+        self.movie.delete()
+        response = self.client.get(self.url, {'since': cursor})
+        tombstones = {(c['kind'], c['id']) for c in response.data['changes'] if c['op'] == 'delete'}
+        self.assertEqual(tombstones, {
+            ('movie', movie_id), ('review', self.review.id), ('comment', self.comment.id),
+        })
+        self.assertTrue(all(c['data'] is None for c in response.data['changes']))
+
+    def test_changes_pagination(self):
+        """Test that limit pages through the log with has_more."""
+        response = self.client.get(self.url, {'limit': 2})
+        self.assertEqual(len(response.data['changes']), 2)
+        self.assertTrue(response.data['has_more'])
+        response = self.client.get(self.url, {'since': response.data['next_cursor'], 'limit': 2})
+        self.assertEqual(len(response.data['changes']), 1)
+        self.assertFalse(response.data['has_more'])
+
+    def test_invalid_cursor_rejected(self):
+        """Test that a non-integer cursor is rejected."""
+        response = self.client.get(self.url, {'since': 'abc'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_compact_keeps_latest_entry_per_object(self):
+        """Test that compaction drops superseded entries only."""
+        self.movie.rating = 4.5
+        self.movie.save()
+        review_id = self.review.id
+        self.review.delete()
+        removed = ChangeLogEntry.objects.compact()
+        self.assertEqual(removed, 3)
+        latest = {(e.kind, e.object_id): e.op for e in ChangeLogEntry.objects.all()}
+        self.assertEqual(latest[('movie', self.movie.id)], 'upsert')
+        self.assertEqual(latest[('review', review_id)], 'delete')
+        self.assertEqual(latest[('comment', self.comment.id)], 'delete')
+
+    def test_migration_logs_existing_rows(self):
+        """Test that rows created before the change log are listed from cursor 0."""
+        ChangeLogEntry.objects.all().delete()
+        migration = importlib.import_module('movies.migrations.0005_changelogentry')
+        migration.log_existing_rows(django_apps, None)
+        response = self.client.get(self.url, {'since': 0})
+        self.assertEqual({(c['kind'], c['id']) for c in response.data['changes']}, {
+            ('movie', self.movie.id), ('review', self.review.id), ('comment', self.comment.id),
+        })
+
+    def test_compact_deletes_without_loading_entries(self):
+        """Test that change log deletes stay single-query fast deletes."""
+        self.movie.save()
+        self.assertTrue(Collector(using='default').can_fast_delete(ChangeLogEntry.objects.all()))
+        self.assertTrue(Collector(using='default').can_fast_delete(TrendingCounter.objects.all()))
+        with self.assertNumQueries(1):
+            self.assertEqual(ChangeLogEntry.objects.compact(), 1)
+
+
+
+class LiveEventsTest(SimpleTestCase):
+    """Test the in-process event broker and the server-sent events stream."""
+
+    def setUp(self):
+        """Install a fresh broker with a small queue for each test."""
+        self.broker = events.EventBroker(history_size=3, queue_size=2)
+        patcher = mock.patch.object(events, 'broker', self.broker)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def event(self, event_id, movie_id=1):
+        return events.Event(id=event_id, kind='review', movie_id=movie_id, data={'id': event_id})
+
+    def test_subscriber_filtered_by_movie(self):
+        """Test that a movie-scoped subscriber only receives that movie's events."""
+        async def scenario():
+            subscription, _ = self.broker.subscribe(movie_id=2)
+            self.broker.publish(self.event(1, movie_id=1))
+            self.broker.publish(self.event(2, movie_id=2))
+            return await subscription.get(timeout=1)
+        self.assertEqual(asyncio.run(scenario()).id, 2)
+
+    def test_slow_consumer_overflows(self):
+        """Test that a full queue marks the subscription as overflowed instead of growing."""
+        async def scenario():
+            subscription, _ = self.broker.subscribe()
+            for event_id in range(1, 5):
+                self.broker.publish(self.event(event_id))
+            await asyncio.sleep(0)
+            return subscription
+        subscription = asyncio.run(scenario())
+        self.assertTrue(subscription.overflowed)
+        self.assertEqual(len(subscription._queue), 2)
+
+    def test_resume_replays_buffered_events(self):
+        """Test that Last-Event-ID replays newer buffered events."""
+        for event_id in range(1, 4):
+            self.broker.publish(self.event(event_id))
+
+        async def scenario():
+            subscription, missed = self.broker.subscribe(last_event_id=1)
+            return missed, [(await subscription.get(timeout=1)).id for _ in range(2)]
+        self.assertEqual(asyncio.run(scenario()), (False, [2, 3]))
+
+    def test_resume_past_history_reports_missed(self):
+        """Test that resuming from an evicted id reports missed events."""
+        for event_id in range(1, 6):
+            self.broker.publish(self.event(event_id))
+
+        async def scenario():
+            return self.broker.subscribe(last_event_id=1)[1]
+        self.assertTrue(asyncio.run(scenario()))
+
+    def test_resume_on_fresh_broker_sends_reset(self):
+        """Test that resuming before the change log's end on a fresh broker starts with a reset event."""
+        request = AsyncRequestFactory().get('/api/v1/events/', headers={'Last-Event-ID': '100'})
+
+        def load_floor():
+            self.broker.floor = 150
+
+        async def scenario():
+            response = await live_events(request, version='v1')
+            stream = response.streaming_content
+            chunks = [await anext(stream), await anext(stream)]
+            await stream.aclose()
+            return chunks
+        with mock.patch.object(self.broker, 'load_floor', side_effect=load_floor) as loaded:
+            chunks = asyncio.run(scenario())
+        loaded.assert_called_once()
+        self.assertEqual(chunks[1], b'event: reset\ndata: {"since": 100}\n\n')
+
+    def test_stream_delivers_published_events(self):
+        """Test that the SSE view streams published events and unsubscribes on close."""
+        request = AsyncRequestFactory().get('/api/v1/events/', {'movie_id': 1})
+
+        async def scenario():
+            response = await live_events(request, version='v1')
+            stream = response.streaming_content
+            first = await anext(stream)
+            self.broker.publish(self.event(7))
+            second = await anext(stream)
+            await stream.aclose()
+            return response, first, second
+        response, first, second = asyncio.run(scenario())
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        self.assertTrue(first.startswith(b'retry:'))
+        self.assertEqual(second, b'id: 7\nevent: review\ndata: {"id": 7}\n\n')
+        self.assertEqual(self.broker.subscriber_count, 0)
+
+    def test_wsgi_request_is_refused(self):
+        """Test that the stream is not served under WSGI, where it would be buffered forever."""
+        response = asyncio.run(live_events(RequestFactory().get('/api/v1/events/'), version='v1'))
+        self.assertEqual(response.status_code, 501)
+        self.assertEqual(self.broker.subscriber_count, 0)
+
+
+class LiveEventPublishTest(APITestCase):
+    """Test that model writes are published to the live feed on commit."""
+
+    def test_review_save_published_on_commit(self):
+        """Test that creating a review publishes an event keyed by its change sequence."""
+        broker = events.EventBroker()
+        movie = Movie.objects.create(title="Test Movie", director="Test Director", release_year=2020, rating=4.0)
+        with mock.patch.object(events, 'broker', broker):
+            with self.captureOnCommitCallbacks(execute=True):
+                review = Review.objects.create(movie=movie, title="Review", content="Review content", rating=4)
+        event = broker._history[-1]
+        self.assertEqual(event.kind, 'review')
+        self.assertEqual(event.movie_id, movie.id)
+        self.assertEqual(event.data['id'], review.id)
+        self.assertEqual(event.id, ChangeLogEntry.objects.filter(kind='review').latest('seq').seq)
+
+    def test_fresh_broker_floor_starts_at_change_log_end(self):
+        """Test that a restarted broker reports events logged before it started as missed."""
+        movie = Movie.objects.create(title="Heat", director="Michael Mann", release_year=1995, rating=4.2)
+        Review.objects.create(movie=movie, user_name="Ann", title="T", content="C", rating=4)
+        latest = ChangeLogEntry.objects.latest('seq').seq
+        broker = events.EventBroker()
+        broker.load_floor()
+
+        async def missed(last_event_id):
+            return broker.subscribe(last_event_id=last_event_id)[1]
+        self.assertTrue(asyncio.run(missed(latest - 1)))
+        self.assertFalse(asyncio.run(missed(latest)))
+
+
+class LoadSheddingTest(SimpleTestCase):
+    """Test adaptive concurrency limiting and per-client throttling."""
+
+    def test_aimd_limiter_adapts_to_latency(self):
+        """Test that fast requests raise the limit and slow ones cut it."""
+        limiter = AIMDLimiter(initial=4, min=1, max=8, target_latency=0.1, backoff=0.5)
+        self.assertTrue(limiter.try_acquire())
+        limiter.release(0.01)
+        self.assertEqual(limiter.limit, 4.25)
+        limiter.try_acquire()
+        limiter.release(1.0)
+        self.assertEqual(limiter.limit, 2.125)
+        self.assertEqual(limiter.inflight, 0)
+
+    def test_limiter_rejects_when_full(self):
+        """Test that no slot is handed out beyond the current limit."""
+        limiter = AIMDLimiter(initial=1, min=1, max=4, target_latency=0.1)
+        self.assertTrue(limiter.try_acquire())
+        self.assertFalse(limiter.try_acquire())
+
+    def test_token_bucket_refills(self):
+        """Test that an empty bucket reports the wait and refills over time."""
+        throttle = ClientThrottle(rate=2, burst=2, max_clients=10)
+        self.assertEqual(throttle.take('a', now=0), 0)
+        self.assertEqual(throttle.take('a', now=0), 0)
+        self.assertEqual(throttle.take('a', now=0), 0.5)
+        self.assertEqual(throttle.take('b', now=0), 0)
+        self.assertEqual(throttle.take('a', now=0.5), 0)
+
+    @override_settings(LOAD_SHEDDING={'CLIENT_RATE': 1, 'CLIENT_BURST': 1})
+    def test_throttled_client_gets_429(self):
+        """Test that a client over its rate is rejected with Retry-After."""
+        middleware = LoadSheddingMiddleware(lambda request: HttpResponse())
+        request = RequestFactory().get('/api/v1/movies/')
+        self.assertEqual(middleware(request).status_code, 200)
+        response = middleware(request)
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response['Retry-After'], '1')
+
+    @override_settings(LOAD_SHEDDING={
+        'ROUTE_CLASSES': {'heavy': ['movie-list'], 'light': ['movie-average-rating']},
+        'CONCURRENCY': {
+            'heavy': {'initial': 1, 'min': 1, 'max': 1, 'target_latency': 1},
+            'light': {'initial': 1, 'min': 1, 'max': 1, 'target_latency': 1},
+        },
+    })
+    def test_saturated_route_class_gets_503(self):
+        """Test that a full heavy class sheds heavy requests but not light ones."""
+        factory = RequestFactory()
+        inner = {}
+
+        def get_response(request):
+            if request.path == '/api/v1/movies/' and not inner:
+                inner['heavy'] = middleware(factory.get('/api/v1/movies/'))
+                inner['light'] = middleware(factory.get('/api/v1/movies/1/average_rating/'))
+            return HttpResponse()
+
+        middleware = LoadSheddingMiddleware(get_response)
+        self.assertEqual(middleware(factory.get('/api/v1/movies/')).status_code, 200)
+        self.assertEqual(inner['heavy'].status_code, 503)
+        self.assertEqual(inner['heavy']['Retry-After'], '1')
+        self.assertEqual(inner['light'].status_code, 200)
+
+
+
+@override_settings(BATCH_MAX_IDS=3)
+class BatchAPITest(APITestCase):
+    """Test the batch multi-get endpoints for movies and reviews."""
+
+    def setUp(self):
+        """Create two movies, one with a review, a comment and a rating."""
+        self.movie = Movie.objects.create(title="Inception", director="Christopher Nolan", release_year=2010, rating=4.8)
+        self.other = Movie.objects.create(title="Memento", director="Christopher Nolan", release_year=2000, rating=4.5)
+        self.review = Review.objects.create(movie=self.movie, user_name="Reviewer", title="Review", content="Content", rating=4)
+        Comment.objects.create(movie=self.movie, review=self.review, user_name="User1", content="Comment")
+        Rating.objects.create(movie=self.movie, user_name="Rater", rating=5)
+
+    def test_movie_batch_preserves_order_and_reports_missing(self):
+        """Test that results follow the requested order with not-found entries."""
+        url = f'/api/v1/movies/batch/?ids={self.other.id},999,{self.movie.id}'
+        with self.assertNumQueries(4):
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        results = response.data['results']
+        self.assertEqual([r['id'] for r in results], [self.other.id, 999, self.movie.id])
+        self.assertEqual([r['found'] for r in results], [True, False, True])
+        self.assertIsNone(results[1]['data'])
+        self.assertEqual(results[2]['data']['average_user_rating'], 5)
+        self.assertEqual(len(results[2]['data']['reviews'][0]['comments']), 1)
+
+    def test_review_batch_post_body(self):
+        """Test the POST variant for reviews."""
+        response = self.client.post('/api/v1/reviews/batch/', {'ids': [self.review.id, self.review.id]}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data['results']), 1)
+        self.assertEqual(response.data['results'][0]['data']['title'], "Review")
+
+    def test_batch_rejects_too_many_or_invalid_ids(self):
+        """Test that oversized or malformed id lists are rejected."""
+        response = self.client.get('/api/v1/movies/batch/?ids=1,2,3,4')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.client.get('/api/v1/movies/batch/?ids=1,abc')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.client.get('/api/v1/movies/batch/')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        for ids in ('100000000000000000000', '-1', '1.9', '\u00b2'):
+            with self.subTest(ids=ids):
+                response = self.client.get('/api/v1/movies/batch/', {'ids': ids})
+                self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        for ids in ([1.9], [True], [10**20], [None]):
+            with self.subTest(ids=ids):
+                response = self.client.post('/api/v1/movies/batch/', {'ids': ids}, format='json')
+                self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.client.post('/api/v1/movies/batch/', {'ids': [str(self.movie.id)]}, format='json')
+        self.assertEqual(response.data['results'][0]['found'], True)
+
+
+
+class RatingUpsertTest(APITestCase):
+    """Test per-user rating uniqueness, the my_rating upsert and movie aggregates."""
+
+    def setUp(self):
+        """Create a movie rated once by another user."""
+        self.movie = Movie.objects.create(title="Test Movie", director="Test Director", release_year=2020, rating=4.0)
+        Rating.objects.create(movie=self.movie, user_name="Other", rating=2)
+        self.url = f'/api/v1/movies/{self.movie.id}/my_rating/'
+
+    def test_upsert_creates_then_replaces(self):
+        """Test that re-rating replaces the user's row with one upsert statement."""
+        response = self.client.put(self.url, {'user_name': "Rater", 'rating': 5})
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.put(self.url, {'user_name': "Rater", 'rating': 3})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['rating'], 3)
+        inserts = [q['sql'] for q in queries if q['sql'].startswith('INSERT INTO "movies_rating"')]
+        self.assertEqual(len(inserts), 1)
+        self.assertIn('ON CONFLICT', inserts[0])
+        self.assertEqual(Rating.objects.filter(movie=self.movie, user_name="Rater").count(), 1)
+        self.assertEqual(ChangeLogEntry.objects.filter(kind='rating', object_id=response.data['id']).count(), 2)
+
+    def test_upsert_requires_user_name(self):
+        """Test that a rating without user_name is rejected rather than crashing."""
+        response = self.client.put(self.url, {'rating': 5})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('user_name', response.data)
+
+    def test_aggregates_follow_upserts_updates_and_deletes(self):
+        """Test that the movie's denormalized aggregates stay consistent."""
+        self.client.put(self.url, {'user_name': "Rater", 'rating': 5})
+        self.client.put(self.url, {'user_name': "Rater", 'rating': 4})
+        self.movie.refresh_from_db()
+        self.assertEqual((self.movie.user_rating_count, self.movie.user_rating_sum), (2, 6))
+        self.assertEqual(self.movie.average_user_rating, 3.0)
+
+        rating = Rating.objects.get(user_name="Other")
+        rating.rating = 4
+        rating.save()
+        Rating.objects.get(user_name="Rater").delete()
+        self.movie.refresh_from_db()
+        self.assertEqual((self.movie.user_rating_count, self.movie.average_user_rating), (1, 4.0))
+
+        Movie.objects.update(user_rating_count=0, user_rating_sum=0, average_user_rating=0)
+        Movie.objects.refresh_rating_aggregates()
+        self.movie.refresh_from_db()
+        self.assertEqual((self.movie.user_rating_count, self.movie.average_user_rating), (1, 4.0))
+
+    def test_movie_save_keeps_aggregates(self):
+        """Test that saving a movie loaded before a rating was written leaves the aggregates alone."""
+        stale = Movie.objects.get(pk=self.movie.pk)
+        self.client.put(self.url, {'user_name': "Rater", 'rating': 4})
+        stale.title = "Renamed"
+        stale.save()
+        response = self.client.patch(f'/api/v1/movies/{self.movie.id}/', {'rating': 3.5})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.movie.refresh_from_db()
+        self.assertEqual((self.movie.title, self.movie.rating), ("Renamed", 3.5))
+        self.assertEqual((self.movie.user_rating_count, self.movie.average_user_rating), (2, 3.0))
+
+    def test_duplicate_rating_create_rejected(self):
+        """Test that creating a second rating for the same user and movie is rejected."""
+        url = reverse('rating-list', kwargs={'version': 'v1'})
+        response = self.client.post(url, {'movie': self.movie.id, 'user_name': "Other", 'rating': 5})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_upsert_validates_rating(self):
+        """Test that my_rating enforces the 1-5 bounds."""
+        response = self.client.put(self.url, {'user_name': "Rater", 'rating': 6})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+
+class AdminScalingTest(APITestCase):
+    """Test the admin changelists, foreign key widgets and bulk actions."""
+
+    def setUp(self):
+        """Log in as a superuser and create movies with user content."""
+        self.client.force_login(get_user_model().objects.create_superuser('admin', 'admin@example.com', None))
+        self.movie = Movie.objects.create(title="Test Movie", director="Test Director", release_year=2020, rating=4.0)
+        self.other = Movie.objects.create(title="Other Movie", director="Test Director", release_year=2021, rating=3.0)
+        for movie in (self.movie, self.other):
+            review = Review.objects.create(movie=movie, user_name="Spammer", title="Buy", content="Spam", rating=1)
+            Comment.objects.create(movie=movie, review=review, user_name="Spammer", content="Spam")
+            Rating.objects.create(movie=movie, user_name="Spammer", rating=1)
+            Rating.objects.create(movie=movie, user_name="Fan", rating=5)
+
+    def test_changelist_queries_do_not_grow_with_rows(self):
+        """Test that the review changelist joins movies instead of querying per row."""
+        url = reverse('admin:movies_review_changelist')
+        with CaptureQueriesContext(connection) as two_rows:
+            self.assertEqual(self.client.get(url).status_code, 200)
+        for i in range(5):
+            Review.objects.create(movie=self.other, user_name=f"User{i}", title="T", content="C", rating=3)
+        with CaptureQueriesContext(connection) as seven_rows:
+            self.client.get(url)
+        self.assertEqual(len(two_rows), len(seven_rows))
+
+    def test_change_form_uses_autocomplete(self):
+        """Test that the comment form does not inline every movie and review."""
+        response = self.client.get(reverse('admin:movies_comment_add'))
+        self.assertContains(response, 'admin-autocomplete')
+        self.assertNotContains(response, 'Other Movie (2021)')
+
+    @override_settings(ESTIMATED_COUNT_THRESHOLD=1)
+    def test_unfiltered_changelist_uses_estimated_count(self):
+        """Test that an unfiltered changelist skips COUNT(*) above the threshold."""
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('admin:movies_rating_changelist'))
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(any('COUNT(*)' in q['sql'] and 'movies_rating' in q['sql'] for q in queries))
+
+    def test_delete_user_content_action(self):
+        """Test that the spam action removes a user's rows with tombstones and fixes aggregates."""
+        review_ids = list(Review.objects.values_list('pk', flat=True))
+        response = self.client.post(reverse('admin:movies_review_changelist'), {
+            'action': 'delete_user_content',
+            '_selected_action': review_ids[:1],
+        })
+        self.assertEqual(response.status_code, 302)
+        self.assertFalse(Review.objects.exists())
+        self.assertFalse(Comment.objects.exists())
+        self.assertEqual(set(Rating.objects.values_list('user_name', flat=True)), {"Fan"})
+        self.assertEqual(ChangeLogEntry.objects.filter(op='delete').count(), 6)
+        self.assertEqual(
+            set(ChangeLogEntry.objects.filter(op='delete', kind='review').values_list('object_id', flat=True)),
+            set(review_ids),
+        )
+        self.movie.refresh_from_db()
+        self.assertEqual((self.movie.user_rating_count, self.movie.average_user_rating), (1, 5.0))
+
+    def test_delete_user_content_from_each_admin(self):
+        """Test that the spam action removes all of a user's content whichever table it is run from."""
+        for model in (Comment, Rating):
+            with self.subTest(model=model.__name__):
+                with transaction.atomic():
+                    selected = model.objects.filter(user_name="Spammer").values_list('pk', flat=True)[:1]
+                    response = self.client.post(reverse(f'admin:movies_{model._meta.model_name}_changelist'), {
+                        'action': 'delete_user_content',
+                        '_selected_action': list(selected),
+                    })
+                    self.assertEqual(response.status_code, 302)
+                    for content_model in (Review, Rating, Comment):
+                        self.assertFalse(content_model.objects.filter(user_name="Spammer").exists())
+                    self.assertEqual(Rating.objects.filter(user_name="Fan").count(), 2)
+                    transaction.set_rollback(True)
+
+    def test_recompute_rating_aggregates_action(self):
+        """Test that the movie action recomputes aggregates from ratings."""
+        Movie.objects.update(user_rating_count=0, user_rating_sum=0, average_user_rating=0)
+        self.client.post(reverse('admin:movies_movie_changelist'), {
+            'action': 'recompute_rating_aggregates',
+            '_selected_action': [self.movie.pk],
+        })
+        self.movie.refresh_from_db()
+        self.other.refresh_from_db()
+        self.assertEqual((self.movie.user_rating_count, self.movie.average_user_rating), (2, 3.0))
+        self.assertEqual(self.other.user_rating_count, 0)
+
+
+
+class CachedSchemaTest(SimpleTestCase):
+    """Test that the OpenAPI schema is built once and served with an ETag."""
+
+    def setUp(self):
+        """Point the schema directory at a temporary folder and start with an empty cache."""
+        schema_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(schema_dir.cleanup)
+        overrides = override_settings(API_SCHEMA_DIR=schema_dir.name)
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+        schema.schema_cache.clear()
+        self.addCleanup(schema.schema_cache.clear)
+
+    def test_schema_generated_once_and_revalidated(self):
+        """Test that repeated requests reuse the schema and honour If-None-Match."""
+        with mock.patch.object(schema, 'generate_schema', wraps=schema.generate_schema) as generate:
+            first = self.client.get('/api/schema/', HTTP_ACCEPT='application/json')
+            second = self.client.get('/api/schema/', HTTP_ACCEPT='application/json',
+                                     HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(first.status_code, 200)
+        self.assertIn('/api/v1/movies/', first.json()['paths'])
+        self.assertEqual(second.status_code, 304)
+        self.assertEqual(generate.call_count, 1)
+
+    def test_yaml_by_default(self):
+        """Test that YAML is served when JSON is not requested."""
+        response = self.client.get('/api/schema/')
+        self.assertEqual(response['Content-Type'], schema.YAML_MEDIA_TYPE)
+        self.assertTrue(response.content.startswith(b'openapi:'))
+
+    def test_prebuilt_file_used_for_current_code_version(self):
+        """Test that a built schema file is served and ignored after a code change."""
+        schema.schema_path('v1').parent.mkdir(parents=True, exist_ok=True)
+        schema.schema_path('v1').write_bytes(b'{"prebuilt": true}')
+        response = self.client.get('/api/schema/', {'format': 'json'})
+        self.assertEqual(response.json(), {'prebuilt': True})
+
+        with override_settings(API_CODE_VERSION='next-release'):
+            schema.code_version.cache_clear()
+            self.addCleanup(schema.code_version.cache_clear)
+            response = self.client.get('/api/schema/', {'format': 'json'})
+        self.assertIn('paths', response.json())
+
+    def test_unknown_version_404(self):
+        """Test that unknown API versions are rejected."""
+        self.assertEqual(self.client.get('/api/schema/', {'version': 'v9'}).status_code, 404)
+
+    def test_custom_actions_document_their_shapes(self):
+        """Test that custom actions are documented with their own parameters and bodies, not the viewset's."""
+        paths = self.client.get('/api/schema/', {'format': 'json'}).json()['paths']
+
+        def ref(content):
+            return content['application/json']['schema']['$ref'].rsplit('/', 1)[1]
+        batch = paths['/api/v1/movies/batch/']
+        self.assertEqual([p['name'] for p in batch['get']['parameters']], ['ids'])
+        self.assertEqual(ref(batch['post']['requestBody']['content']), 'MovieBatchRequest')
+        self.assertEqual(ref(batch['get']['responses']['200']['content']), 'MovieBatchResponse')
+        reviews = paths['/api/v1/reviews/batch/']['post']
+        self.assertEqual(ref(reviews['responses']['200']['content']), 'ReviewBatchResponse')
+        my_rating = paths['/api/v1/movies/{id}/my_rating/']['put']
+        self.assertEqual(ref(my_rating['requestBody']['content']), 'RatingUpsert')
+        self.assertEqual([ref(my_rating['responses'][code]['content']) for code in ('200', '201')], ['Rating'] * 2)
+        trend = paths['/api/v1/movies/{id}/rating_trend/']['get']
+        self.assertEqual([p['name'] for p in trend['parameters']], ['end', 'granularity', 'id', 'start'])
+        self.assertEqual(ref(trend['responses']['200']['content']), 'RatingTrend')
+
+    def test_warm_up_builds_before_first_request(self):
+        """Test that warming up at startup leaves nothing to build on the request path."""
+        with mock.patch.object(schema, 'generate_schema', wraps=schema.generate_schema) as generate:
+            with override_settings(API_SCHEMA_WARM_ON_STARTUP=False):
+                schema.warm_up()
+            self.assertEqual(generate.call_count, 0)
+            schema.warm_up()
+            self.assertEqual(generate.call_count, 1)
+            response = self.client.get('/api/schema/', {'format': 'json'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(generate.call_count, 1)
+
+
+@override_settings(HOMEPAGE_PAGE_SIZE=2, HOMEPAGE_REVIEWS_PER_MOVIE=2)
+class HomepageTest(APITestCase):
+    """Test homepage pagination and the lazily loaded review fragments."""
+
+    def setUp(self):
+        """Create three movies; the newest has three reviews."""
+        self.movies = [
+            Movie.objects.create(title=f"Movie {year}", director="Director", release_year=year, rating=3.0)
+            for year in (2001, 2002, 2003)
+        ]
+        for i in range(3):
+            Review.objects.create(movie=self.movies[2], user_name=f"User{i}", title=f"Review {i}", content="Content", rating=4)
+        forget_movie_count()
+        self.addCleanup(forget_movie_count)
+
+    def test_first_page_is_bounded(self):
+        """Test that only one page of movies is rendered, newest first, without inlining reviews."""
+        response = self.client.get('/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([m.title for m in response.context['movies']], ["Movie 2003", "Movie 2002"])
+        self.assertEqual(response.context['total_movies'], 3)
+        self.assertContains(response, "Show 3 Reviews")
+        self.assertNotContains(response, "Review 0")
+        self.assertContains(response, "page=2")
+
+    def test_query_count_independent_of_catalog_size(self):
+        """Test that adding movies does not add homepage queries."""
+        with CaptureQueriesContext(connection) as before:
+            self.client.get('/')
+        for year in range(1990, 2000):
+            Movie.objects.create(title=f"Movie {year}", director="Director", release_year=year, rating=3.0)
+        forget_movie_count()
+        with CaptureQueriesContext(connection) as after:
+            self.client.get('/')
+        self.assertEqual(len(before), len(after))
+
+    def test_ordering_and_invalid_values(self):
+        """Test the ordering allowlist and fallbacks for unknown ordering or page."""
+        response = self.client.get('/', {'ordering': 'oldest', 'page': 2})
+        self.assertEqual([m.title for m in response.context['movies']], ["Movie 2003"])
+        response = self.client.get('/', {'ordering': 'content', 'page': 'x'})
+        self.assertEqual(response.context['ordering'], 'newest')
+        self.assertEqual(response.context['page_obj'].number, 1)
+
+    @override_settings(ESTIMATED_COUNT_THRESHOLD=0)
+    def test_total_is_exact_after_deletes(self):
+        """Test that the total and page links follow deletes instead of estimating from the largest id."""
+        self.assertEqual(self.client.get('/').context['total_movies'], 3)
+        with self.captureOnCommitCallbacks(execute=True):
+            Movie.objects.filter(pk=self.movies[0].pk).bulk_delete()
+        response = self.client.get('/')
+        self.assertEqual(response.context['total_movies'], 2)
+        self.assertFalse(response.context['page_obj'].has_next())
+        with self.captureOnCommitCallbacks(execute=True):
+            Movie.objects.create(title="Movie 2004", director="Director", release_year=2004, rating=3.0)
+        self.assertEqual(self.client.get('/').context['total_movies'], 3)
+
+    def test_stale_count_never_serves_an_empty_page(self):
+        """Test that a count cached before another process deleted movies is recounted on an empty page."""
+        cache.set(MOVIE_COUNT_CACHE_KEY, 10)
+        response = self.client.get('/', {'page': 4})
+        self.assertEqual(response.context['page_obj'].number, 2)
+        self.assertEqual([m.title for m in response.context['movies']], ["Movie 2001"])
+        self.assertEqual(response.context['total_movies'], 3)
+
+    def test_reviews_fragment_returns_latest_reviews(self):
+        """Test that the fragment renders only the movie's latest reviews."""
+        response = self.client.get(reverse('movie-reviews-fragment', args=[self.movies[2].pk]))
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, "Review 2")
+        self.assertContains(response, "Review 1")
+        self.assertNotContains(response, "Review 0")
+
+
+
+class RatingTrendTest(APITestCase):
+    """Test incremental rating rollups, the rating_trend action and rating archival."""
+
+    def setUp(self):
+        """Create a movie with ratings in January and March 2024."""
+        self.movie = Movie.objects.create(title="Test Movie", director="Test Director", release_year=2020, rating=4.0)
+        self.url = f'/api/v1/movies/{self.movie.id}/rating_trend/'
+        for user_name, value, day in (("A", 5, 3), ("B", 3, 3), ("C", 4, 20)):
+            self.rate(user_name, value, datetime.datetime(2024, 1, day, 12, tzinfo=datetime.timezone.utc))
+        self.rate("D", 1, datetime.datetime(2024, 3, 1, tzinfo=datetime.timezone.utc))
+
+    def rate(self, user_name, value, when):
+        with mock.patch('django.utils.timezone.now', return_value=when):
+            return Rating.objects.create(movie=self.movie, user_name=user_name, rating=value)
+
+    def test_monthly_trend_reads_only_rollups(self):
+        """Test the monthly trend without touching the raw rating table."""
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertFalse(any('"movies_rating"' in q['sql'] for q in queries))
+        buckets = response.data['buckets']
+        self.assertEqual([b['bucket'] for b in buckets], ['2024-01-01', '2024-03-01'])
+        self.assertEqual((buckets[0]['count'], buckets[0]['average']), (3, 4.0))
+        self.assertEqual(buckets[0]['histogram'], {'1': 0, '2': 0, '3': 1, '4': 1, '5': 1})
+
+    def test_daily_trend_with_range(self):
+        """Test day buckets filtered by start and end."""
+        response = self.client.get(self.url, {'granularity': 'day', 'start': '2024-01-04', 'end': '2024-02-01'})
+        self.assertEqual([(b['bucket'], b['count']) for b in response.data['buckets']], [('2024-01-20', 1)])
+        self.assertEqual(self.client.get(self.url, {'granularity': 'week'}).status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_updates_and_deletes_move_rollups(self):
+        """Test that changing and deleting ratings keep the buckets consistent."""
+        rating = Rating.objects.get(user_name="A")
+        rating.rating = 1
+        rating.save()
+        Rating.objects.get(user_name="D").delete()
+        self.client.put(f'/api/v1/movies/{self.movie.id}/my_rating/', {'user_name': "B", 'rating': 2})
+        january = RatingRollup.objects.get(movie=self.movie, granularity='month', bucket=datetime.date(2024, 1, 1))
+        self.assertEqual((january.count, january.total), (2, 5))
+        march = RatingRollup.objects.get(movie=self.movie, granularity='month', bucket=datetime.date(2024, 3, 1))
+        self.assertEqual(march.count, 0)
+        self.assertEqual(RatingRollup.objects.filter(granularity='month').aggregate(n=Sum('count'))['n'], 3)
+
+    def test_archive_keeps_trend_and_aggregates(self):
+        """Test that compacting old ratings leaves the trend and averages intact."""
+        call_command('compact_ratings', retention_days=30, stdout=open(os.devnull, 'w'))
+        self.assertFalse(Rating.objects.exists())
+        self.assertEqual(ChangeLogEntry.objects.filter(kind='rating', op='delete').count(), 4)
+        self.assertEqual(len(self.client.get(self.url).data['buckets']), 2)
+        self.movie.refresh_from_db()
+        self.assertEqual((self.movie.user_rating_count, self.movie.average_user_rating), (4, 3.25))
+        Movie.objects.refresh_rating_aggregates()
+        self.movie.refresh_from_db()
+        self.assertEqual((self.movie.user_rating_count, self.movie.average_user_rating), (4, 3.25))
+
+    def test_rating_again_replaces_archived_rating(self):
+        """Test that a user's rating after archival replaces the archived one instead of counting twice."""
+        call_command('compact_ratings', retention_days=30, stdout=open(os.devnull, 'w'))
+        self.assertEqual(ArchivedRating.objects.count(), 4)
+        response = self.client.put(f'/api/v1/movies/{self.movie.id}/my_rating/', {'user_name': "A", 'rating': 1})
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.rate("B", 1, datetime.datetime(2024, 4, 1, tzinfo=datetime.timezone.utc))
+        self.movie.refresh_from_db()
+        self.assertEqual((self.movie.user_rating_count, self.movie.user_rating_sum), (4, 7))
+        self.assertEqual(set(ArchivedRating.objects.values_list('user_name', flat=True)), {"C", "D"})
+        january = RatingRollup.objects.get(movie=self.movie, granularity='month', bucket=datetime.date(2024, 1, 1))
+        self.assertEqual((january.count, january.total), (1, 4))
+        Movie.objects.refresh_rating_aggregates()
+        self.movie.refresh_from_db()
+        self.assertEqual((self.movie.user_rating_count, self.movie.user_rating_sum), (4, 7))
+
+    def test_deleting_movie_removes_rollups(self):
+        """Test that a movie delete cascades to its rollups without recreating them."""
+        self.movie.delete()
+        self.assertFalse(RatingRollup.objects.exists())
+
+
+class TrendingTest(APITestCase):
+    """Test the sliding-window activity counters, their checkpoints and the trending action."""
+
+    def setUp(self):
+        """Create movies and a trending tracker on a controllable clock."""
+        self.now = 1_700_000_000.0
+        self.tracker = trending.TrendingTracker(checkpoint_seconds=60, clock=lambda: self.now, background=False)
+        patcher = mock.patch.object(trending, 'tracker', self.tracker)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.quiet = Movie.objects.create(title="Quiet", director="D", release_year=2001, rating=4.0)
+        self.busy = Movie.objects.create(title="Busy", director="D", release_year=2002, rating=4.0)
+        self.url = '/api/v1/movies/trending/'
+
+    def test_activity_ranks_movies(self):
+        """Test that new reviews, ratings, comments and helpful clicks raise a movie's score."""
+        with self.captureOnCommitCallbacks(execute=True):
+            review = Review.objects.create(movie=self.busy, user_name="U", title="Great", content="Great", rating=5)
+            Comment.objects.create(movie=self.busy, review=review, user_name="V", content="Agreed")
+            Rating.objects.create(movie=self.quiet, user_name="U", rating=3)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(f'/api/v1/reviews/{review.id}/mark_helpful/')
+        self.tracker.checkpoint()
+        with self.assertNumQueries(1):
+            response = self.client.get(self.url, {'window': '1h'})
+        self.assertEqual([r['movie']['title'] for r in response.data['results']], ["Busy", "Quiet"])
+        self.assertEqual(response.data['results'][0]['score'], 5.5)
+
+    def test_old_activity_decays_and_expires(self):
+        """Test that older slots weigh less and leave the window entirely."""
+        self.tracker.record(self.quiet.id, 'review')
+        self.now += 30 * 60
+        self.tracker.record(self.busy.id, 'rating')
+        self.tracker.record(self.busy.id, 'rating')
+        self.assertEqual([movie_id for movie_id, _ in self.tracker.top('1h')], [self.busy.id, self.quiet.id])
+        self.now += 65 * 60
+        self.assertEqual([movie_id for movie_id, _ in self.tracker.top('1h')], [])
+        self.assertEqual([movie_id for movie_id, _ in self.tracker.top('24h')], [self.quiet.id, self.busy.id])
+
+    def test_checkpoints_merge_across_processes(self):
+        """Test that two trackers add their counts into the table and both read the total."""
+        other = trending.TrendingTracker(checkpoint_seconds=60, clock=lambda: self.now, background=False)
+        self.tracker.record(self.busy.id, 'review')
+        other.record(self.busy.id, 'review')
+        self.tracker.checkpoint()
+        other.checkpoint()
+        self.tracker.checkpoint()
+        self.assertEqual(self.tracker.top('24h'), other.top('24h'))
+        self.assertEqual(self.tracker.top('24h')[0][1], 6.0)
+        self.assertEqual(
+            TrendingCounter.objects.filter(movie=self.busy, window='24h').aggregate(n=Sum('count'))['n'], 6.0,
+        )
+        restarted = trending.TrendingTracker(clock=lambda: self.now, background=False)
+        self.assertEqual(restarted.top('24h'), self.tracker.top('24h'))
+
+    def test_expired_slots_and_deleted_movies_are_dropped(self):
+        """Test that checkpoints prune expired slots and skip movies deleted meanwhile."""
+        self.tracker.record(self.busy.id, 'rating')
+        self.tracker.checkpoint()
+        self.tracker.record(self.quiet.id, 'rating')
+        self.quiet.delete()
+        self.now += 8 * 24 * 3600
+        self.tracker.checkpoint()
+        self.assertFalse(TrendingCounter.objects.exists())
+
+    def test_requests_do_not_checkpoint(self):
+        """Test that recording and reading after the first load never touch the database."""
+        self.tracker.top('1h')
+        self.now += 3600
+        with self.assertNumQueries(0):
+            self.tracker.record(self.busy.id, 'review')
+            self.assertEqual(self.tracker.top('1h'), [(self.busy.id, 3.0)])
+
+    def test_failed_checkpoint_keeps_increments(self):
+        """Test that increments survive a failed flush and are written by the next checkpoint."""
+        self.tracker.record(self.busy.id, 'review')
+        with mock.patch.object(TrendingCounter.objects, 'add', side_effect=DatabaseError("locked")):
+            with self.assertRaises(DatabaseError):
+                self.tracker.checkpoint()
+        self.assertFalse(TrendingCounter.objects.exists())
+        self.tracker.checkpoint()
+        self.assertEqual(
+            TrendingCounter.objects.filter(movie=self.busy, window='24h').aggregate(n=Sum('count'))['n'], 3.0,
+        )
+
+    def test_background_thread_checkpoints(self):
+        """Test that the background thread checkpoints on its interval and keeps going after a failure."""
+        tracker = trending.TrendingTracker(checkpoint_seconds=0.01)
+        self.addCleanup(tracker.stop)
+        done = threading.Event()
+        calls = []
+
+        def checkpoint():
+            calls.append(None)
+            if len(calls) == 1:
+                raise DatabaseError("locked")
+            if len(calls) == 3:
+                done.set()
+
+        with mock.patch.object(tracker, 'checkpoint', checkpoint), self.assertLogs('movies.trending', 'ERROR'):
+            tracker.record(self.busy.id, 'rating')
+            self.assertTrue(done.wait(5))
+            tracker.stop()
+
+    def test_invalid_parameters(self):
+        """Test that unknown windows and non-integer limits are rejected."""
+        self.assertEqual(self.client.get(self.url, {'window': '2d'}).status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.client.get(self.url, {'limit': 'x'}).status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class CatalogSnapshotTest(APITestCase):
+    """Test the in-memory catalog snapshot against the database and its change tracking."""
+
+    def setUp(self):
+        """Create movies and a catalog snapshot on a controllable clock."""
+        self.now = 0.0
+        self.snapshot = catalog.CatalogSnapshot(refresh_seconds=1.0, clock=lambda: self.now)
+        patcher = mock.patch.object(catalog, 'snapshot', self.snapshot)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.alien = Movie.objects.create(title="Alien", director="Ridley Scott", release_year=1979, rating=4.5)
+        self.blade = Movie.objects.create(title="Blade Runner", director="Ridley Scott", release_year=1982, rating=4.8)
+        self.heat = Movie.objects.create(title="Heat", director="Michael Mann", release_year=1995, rating=4.2)
+        self.url = '/api/v1/movies/'
+
+    def summaries(self, **params):
+        return self.client.get(self.url, {'nested': 'false', **params}).json()
+
+    def test_snapshot_matches_database(self):
+        """Test that each filter and ordering returns the same rows from the snapshot and the database."""
+        # Newest id, oldest year: index order differs from id order.
+        Movie.objects.create(title="Metropolis", director="Fritz Lang", release_year=1927, rating=4.0)
+        cases = [
+            {},
+            {'release_year__gte': 1980},
+            {'release_year__gte': 1980, 'release_year__lte': 1990},
+            {'director': "Ridley Scott", 'ordering': '-rating'},
+            {'director': "Nobody"},
+            {'rating__gte': 4.5, 'ordering': 'title'},
+            {'ordering': '-release_year', 'limit': 2},
+            {'ordering': 'rating', 'limit': 1},
+            {'ordering': '-director', 'min_avg_user_rating': 0},
+            {'ordering': '-id', 'limit': 2},
+            {'release_year__gte': 1900, 'ordering': 'id'},
+            {'release_year__lte': 1990},
+        ]
+        for params in cases:
+            with self.subTest(params=params):
+                from_db = self.summaries(**params)
+                with override_settings(MOVIE_CATALOG_SNAPSHOT=True):
+                    from_snapshot = self.summaries(**params)
+                self.assertEqual(from_snapshot, from_db)
+        self.assertEqual([m['title'] for m in self.summaries(ordering='-rating', limit=2)], ["Blade Runner", "Alien"])
+        self.assertNotIn('reviews', self.summaries()[0])
+
+    def test_sorted_indexes_match_database(self):
+        """Test every plan of query() against the database, with ties and after in-place changes."""
+        Movie.objects.bulk_create(
+            Movie(title=f"Movie {i % 7}-{i}", director=f"Director {i % 3}", release_year=1990 + i % 5,
+                  rating=1 + i % 4)
+            for i in range(60)
+        )
+        self.snapshot.load()
+        with self.captureOnCommitCallbacks(execute=True):
+            for movie in Movie.objects.filter(release_year=1991)[:5]:
+                movie.rating, movie.title = 4.5, f"Z {movie.title}"
+                movie.save()
+            Movie.objects.filter(release_year=1993).first().delete()
+        lookups = [
+            {}, {'director': "Director 1"}, {'release_year__gte': 1992, 'release_year__lte': 1993},
+            {'rating__gte': 4}, {'director': "Director 2", 'rating__gte': 2, 'release_year__lte': 1992},
+        ]
+        for filters in lookups:
+            for ordering in ('id', '-id', 'title', '-title', 'release_year', '-release_year', 'rating', '-rating'):
+                for limit in (None, 1, 3, 100):
+                    with self.subTest(filters=filters, ordering=ordering, limit=limit):
+                        expected = Movie.objects.filter(**filters).order_by(ordering, 'id').values(*catalog.FIELDS)
+                        expected = list(expected[:limit] if limit is not None else expected)
+                        self.assertEqual(self.snapshot.query(**filters, ordering=ordering, limit=limit), expected)
+
+    @override_settings(MOVIE_CATALOG_SNAPSHOT=True)
+    def test_values_beyond_32_bits(self):
+        """Test that a release year the database accepts also fits the snapshot, and a bad row changes nothing."""
+        self.summaries()
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(self.url, {
+                'title': "Epoch", 'director': "Nobody", 'release_year': -5_000_000_000, 'rating': 3,
+            })
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(self.summaries(ordering='release_year', limit=1)[0]['title'], "Epoch")
+        self.snapshot.load()
+        self.assertEqual(len(self.summaries()), 4)
+        with self.assertRaises(OverflowError):
+            self.snapshot.upsert(10 ** 6, "Too late", "Nobody", 2 ** 63, 3.0)
+        self.assertEqual(len(self.snapshot), 4)
+        self.assertEqual(len(self.summaries()), 4)
+
+    @override_settings(MOVIE_CATALOG_SNAPSHOT=True)
+    def test_own_writes_apply_without_queries(self):
+        """Test that movie signals update a loaded snapshot in place."""
+        self.summaries()
+        with self.captureOnCommitCallbacks(execute=True):
+            Movie.objects.create(title="Thief", director="Michael Mann", release_year=1981, rating=4.0)
+            self.heat.rating = 3.0
+            self.heat.save()
+            self.alien.delete()
+        with self.assertNumQueries(0):
+            movies = catalog.snapshot.query(director="Michael Mann", ordering='release_year')
+        self.assertEqual([(m['title'], m['rating']) for m in movies], [("Thief", 4.0), ("Heat", 3.0)])
+        self.assertEqual(len(self.snapshot), 3)
+
+    @override_settings(MOVIE_CATALOG_SNAPSHOT=True)
+    def test_generation_check_catches_up(self):
+        """Test that changes logged elsewhere are applied on the next refresh."""
+        self.summaries()
+        Movie.objects.filter(pk=self.heat.pk).update(title="Heat (1995)")
+        ChangeLogEntry.objects.record(self.heat, ChangeLogEntry.UPSERT)
+        Movie.objects.filter(pk=self.alien.pk).bulk_delete()
+        self.assertEqual(len(self.summaries()), 3)
+        self.now += 1
+        self.assertEqual([m['title'] for m in self.summaries()], ["Blade Runner", "Heat (1995)"])
+
+    def test_invalid_parameters(self):
+        """Test that malformed summary filters are rejected."""
+        for params in ({'release_year__gte': 'x'}, {'limit': 'x'}, {'limit': -1}):
+            with self.subTest(params=params):
+                response = self.client.get(self.url, {'nested': 'false', **params})
+                self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class IndexedFilteringTest(APITestCase):
+    """Test the list filters and orderings, and that each one is served by an index."""
+
+    def setUp(self):
+        """Create movies with reviews, ratings and comments."""
+        self.alien = Movie.objects.create(title="Alien", director="Ridley Scott", release_year=1979, rating=4.5)
+        self.heat = Movie.objects.create(title="Heat", director="Michael Mann", release_year=1995, rating=4.2)
+        for movie, user_name in ((self.alien, "Ann"), (self.alien, "Bob"), (self.heat, "Ann")):
+            review = Review.objects.create(movie=movie, user_name=user_name, title="T", content="C", rating=4)
+            Comment.objects.create(movie=movie, review=review, user_name=user_name, content="C")
+            Rating.objects.create(movie=movie, user_name=user_name, rating=3 if movie == self.heat else 5)
+
+    def test_filters_combine(self):
+        """Test that filters combine into one query on the movie table."""
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/v1/movies/', {
+                'nested': 'false', 'release_year__gte': 1970, 'release_year__lte': 1990,
+                'director': "Ridley Scott", 'rating__gte': 4, 'min_avg_user_rating': 4.5,
+            })
+        self.assertEqual([m['title'] for m in response.data], ["Alien"])
+        response = self.client.get('/api/v1/movies/', {'min_avg_user_rating': 4, 'ordering': '-release_year'})
+        self.assertEqual([m['title'] for m in response.data], ["Alien"])
+        response = self.client.get('/api/v1/ratings/', {'user_name': "Ann", 'ordering': 'created_at'})
+        self.assertEqual([r['movie'] for r in response.data], [self.alien.id, self.heat.id])
+        response = self.client.get('/api/v1/reviews/', {'user_name': "Ann", 'movie_id': self.heat.id})
+        self.assertEqual(len(response.data), 1)
+        response = self.client.get('/api/v1/movies/', {'ordering': 'user_rating_sum'})
+        self.assertEqual([m['title'] for m in response.data], ["Alien", "Heat"])
+        self.assertEqual(self.client.get('/api/v1/ratings/', {'movie_id': 'x'}).status_code,
+                         status.HTTP_400_BAD_REQUEST)
+
+    def query_plan(self, url, params, table):
+        """Run a list request and return the query plan of its query on ``table``."""
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        sql = next(q['sql'] for q in queries if q['sql'].startswith('SELECT') and f'FROM "{table}"' in q['sql'])
+        with connection.cursor() as cursor:
+            cursor.execute('EXPLAIN QUERY PLAN ' + sql)
+            return [row[-1] for row in cursor.fetchall()]
+
+    def test_filters_and_orderings_use_indexes(self):
+        """
+        Test the query plan of every allowed filter and ordering, alone and combined.
+
+        Orderings walk an index instead of sorting. Filters search an index,
+        also when ordered, except a range filter ordered by another column:
+        no single index serves both, so the plan may search the filter's
+        index or walk the ordering's index (the table itself for id), but
+        never sort.
+        """
+        endpoints = [
+            ('/api/v1/movies/', 'movies_movie', {
+                'release_year__gte': 1980, 'release_year__lte': 1990, 'director': "Michael Mann",
+                'rating__gte': 4.4, 'min_avg_user_rating': 4,
+            }, ['id', 'title', 'director', 'release_year', 'rating', 'average_user_rating']),
+            ('/api/v1/reviews/', 'movies_review', {'movie_id': self.alien.id, 'user_name': "Ann"}, ['created_at']),
+            ('/api/v1/ratings/', 'movies_rating', {'movie_id': self.alien.id, 'user_name': "Ann"}, ['created_at']),
+            ('/api/v1/comments/', 'movies_comment', {
+                'movie_id': self.alien.id, 'review_id': 1, 'user_name': "Ann",
+            }, ['created_at']),
+        ]
+        range_filters = {
+            'release_year__gte': 'release_year', 'release_year__lte': 'release_year',
+            'rating__gte': 'rating', 'min_avg_user_rating': 'average_user_rating',
+        }
+        for url, table, filters, orderings in endpoints:
+            orderings = [prefix + field for field in orderings for prefix in ('', '-')]
+            for ordering in orderings:
+                with self.subTest(url=url, ordering=ordering):
+                    plan = self.query_plan(url, {'ordering': ordering}, table)
+                    self.assertFalse(any('TEMP B-TREE' in step for step in plan), plan)
+            for name, value in filters.items():
+                for ordering in [None, *orderings]:
+                    params = {name: value, **({'ordering': ordering} if ordering else {})}
+                    with self.subTest(url=url, params=params):
+                        plan = self.query_plan(url, params, table)
+                        scans = [step for step in plan if table in step]
+                        self.assertTrue(scans, plan)
+                        if all(step.startswith('SEARCH') for step in scans):
+                            continue
+                        self.assertTrue(
+                            ordering and name in range_filters and ordering.lstrip('-') != range_filters[name], plan,
+                        )
+                        # Ordering by id walks the table itself, which is keyed by id.
+                        walks = ('SCAN ' + table,) if ordering.lstrip('-') == 'id' else ()
+                        self.assertTrue(all(' USING INDEX ' in step or step in walks for step in scans), plan)
+                        self.assertFalse(any('TEMP B-TREE' in step for step in plan), plan)
+
+    def test_out_of_range_numbers_are_rejected(self):
+        """Test that integers beyond 64 bits and non-finite floats are a 400, not a database error or NaN match."""
+        cases = [
+            ('/api/v1/movies/', {'nested': 'false', 'rating__gte': 'nan'}),
+            ('/api/v1/movies/', {'min_avg_user_rating': 'inf'}),
+            ('/api/v1/ratings/', {'movie_id': 2 ** 63}),
+            ('/api/v1/comments/', {'review_id': -2 ** 63 - 1}),
+            ('/api/v1/movies/', {'release_year__gte': 10 ** 20}),
+            ('/api/v1/movies/', {'nested': 'false', 'limit': 10 ** 20}),
+        ]
+        for url, params in cases:
+            with self.subTest(url=url, params=params):
+                self.assertEqual(self.client.get(url, params).status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.client.get('/api/v1/reviews/', {'movie_id': 2 ** 63 - 1})
+        self.assertEqual((response.status_code, response.data), (status.HTTP_200_OK, []))
+
+
+class CascadeDeleteTest(APITestCase):
+    """Test that movie deletes cascade with set-based SQL from the API and the admin."""
+
+    def setUp(self):
+        """Create two movies with reviews, comments, ratings and rollups."""
+        self.movie = Movie.objects.create(title="Big", director="D", release_year=2000, rating=4.0)
+        self.other = Movie.objects.create(title="Other", director="D", release_year=2001, rating=4.0)
+        for movie, users in ((self.movie, 3), (self.other, 1)):
+            for i in range(users):
+                review = Review.objects.create(movie=movie, user_name=f"U{i}", title="T", content="C", rating=4)
+                Comment.objects.create(movie=movie, review=review, user_name=f"V{i}", content="C")
+                Comment.objects.create(movie=movie, user_name=f"W{i}", content="C")
+                Rating.objects.create(movie=movie, user_name=f"U{i}", rating=5)
+        TrendingCounter.objects.add(self.movie.id, '24h', 1, 3.0)
+
+    def test_destroy_queries_do_not_grow_with_related_rows(self):
+        """Test that deleting a movie costs the same statements however much content it has."""
+        with CaptureQueriesContext(connection) as small:
+            self.client.delete(f'/api/v1/movies/{self.other.id}/')
+        with CaptureQueriesContext(connection) as large:
+            response = self.client.delete(f'/api/v1/movies/{self.movie.id}/')
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertEqual(len(small), len(large))
+        for model in (Movie, Review, Rating, Comment, RatingRollup, TrendingCounter):
+            self.assertFalse(model.objects.exists(), model)
+
+    def test_destroy_keeps_other_movies_and_logs_tombstones(self):
+        """Test that a movie delete tombstones its rows and leaves other movies' aggregates alone."""
+        rating_ids = set(Rating.objects.filter(movie=self.movie).values_list('pk', flat=True))
+        self.client.delete(f'/api/v1/movies/{self.movie.id}/')
+        tombstones = ChangeLogEntry.objects.filter(op='delete')
+        self.assertEqual(set(tombstones.filter(kind='rating').values_list('object_id', flat=True)), rating_ids)
+        self.assertEqual(tombstones.filter(kind='comment').count(), 6)
+        self.assertEqual(list(tombstones.filter(kind='movie').values_list('object_id', flat=True)), [self.movie.id])
+        self.other.refresh_from_db()
+        self.assertEqual((self.other.user_rating_count, self.other.average_user_rating), (1, 5.0))
+        self.assertEqual(RatingRollup.objects.filter(movie=self.other, granularity='month').get().count, 1)
+
+    def test_admin_delete_confirmation_counts_cascade(self):
+        """Test that the admin delete page summarizes related rows and deletes them in bulk."""
+        self.client.force_login(get_user_model().objects.create_superuser('admin', 'admin@example.com', None))
+        url = reverse('admin:movies_movie_delete', args=[self.movie.id])
+        with mock.patch.object(Collector, 'collect', side_effect=AssertionError("collector used")):
+            response = self.client.get(url)
+            self.assertContains(response, 'Reviews: 3')
+            self.assertContains(response, 'Comments: 6')
+            self.assertContains(response, 'Ratings: 3')
+            self.client.post(url, {'post': 'yes'})
+        self.assertEqual(list(Movie.objects.values_list('pk', flat=True)), [self.other.id])
+        self.assertEqual(Comment.objects.count(), 2)
+
+    def test_admin_delete_selected_uses_bulk_delete(self):
+        """Test that the delete_selected action removes movies without the collector."""
+        self.client.force_login(get_user_model().objects.create_superuser('admin', 'admin@example.com', None))
+        with mock.patch.object(Collector, 'collect', side_effect=AssertionError("collector used")):
+            response = self.client.post(reverse('admin:movies_movie_changelist'), {
+                'action': 'delete_selected',
+                '_selected_action': [self.movie.id, self.other.id],
+                'post': 'yes',
+            })
+        self.assertEqual(response.status_code, 302)
+        self.assertFalse(Movie.objects.exists())
+        self.assertFalse(Review.objects.exists())
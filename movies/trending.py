@@ -0,0 +1,212 @@
+"""
+Sliding-window activity counters for the trending movies list.
+
+Ratings, reviews, comments and helpful clicks increment an in-memory ring
+buffer per movie and window (see ``movies/signals.py`` and
+``ReviewViewSet.mark_helpful``). Each window is divided into fixed slots;
+a movie's score is the weighted activity in the window's live slots with
+older slots exponentially decayed. Reading the top-K never touches the
+activity tables.
+
+Every ``TRENDING_CHECKPOINT_SECONDS`` a background thread in each process
+adds the tracker's increments to ``TrendingCounter`` rows and reloads the
+merged counts, so counters survive restarts and each worker process sees
+the others' activity. Requests never wait on a checkpoint, except for the
+first read in a process, which loads the stored counts.
+"""
+import heapq
+import logging
+import threading
+import time
+from collections import defaultdict
+from dataclasses import dataclass
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+
+from .models import Movie, TrendingCounter
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class Window:
+    name: str
+    slot_seconds: int
+    slots: int
+
+    def slot_at(self, timestamp):
+        return int(timestamp // self.slot_seconds)
+
+    def decay(self, age):
+        """Weight of a slot ``age`` slots old: halves every half window."""
+        return 0.5 ** (age / (self.slots / 2))
+
+
+WINDOWS = {
+    window.name: window
+    for window in (
+        Window('1h', slot_seconds=5 * 60, slots=12),
+        Window('24h', slot_seconds=60 * 60, slots=24),
+        Window('7d', slot_seconds=6 * 60 * 60, slots=28),
+    )
+}
+
+ACTIVITY_WEIGHTS = {
+    'rating': 1.0,
+    'review': 3.0,
+    'comment': 2.0,
+    'helpful': 0.5,
+}
+
+
+class RingCounter:
+    """
+    Per-movie ring buffers of slot counts for one window.
+
+    Position ``slot % slots`` holds the count of ``slot``; a position whose
+    stored slot number has fallen out of the window is reset before reuse.
+    """
+
+    def __init__(self, window):
+        self.window = window
+        self._counts = {}
+        self._slots = {}
+
+    def add(self, movie_id, slot, amount):
+        counts = self._counts.get(movie_id)
+        if counts is None:
+            counts = self._counts[movie_id] = [0.0] * self.window.slots
+            self._slots[movie_id] = [None] * self.window.slots
+        position = slot % self.window.slots
+        if self._slots[movie_id][position] != slot:
+            self._slots[movie_id][position] = slot
+            counts[position] = 0.0
+        counts[position] += amount
+
+    def scores(self, current_slot):
+        """Yield ``(score, movie_id)`` for movies with activity in the window."""
+        oldest = current_slot - self.window.slots
+        for movie_id, counts in self._counts.items():
+            score = sum(
+                count * self.window.decay(current_slot - slot)
+                for count, slot in zip(counts, self._slots[movie_id])
+                if slot is not None and oldest < slot <= current_slot
+            )
+            if score > 0:
+                yield score, movie_id
+
+
+class TrendingTracker:
+    """
+    Ring counters for every window plus the increments not yet checkpointed.
+
+    Args:
+        checkpoint_seconds: Interval of the background checkpoint thread.
+        background: Start that thread on first use. Without it, call
+            ``checkpoint()`` explicitly (tests do).
+    """
+
+    def __init__(self, checkpoint_seconds=60, clock=time.time, background=True):
+        self.checkpoint_seconds = checkpoint_seconds
+        self.clock = clock
+        self.background = background
+        self._rings = {name: RingCounter(window) for name, window in WINDOWS.items()}
+        self._pending = defaultdict(float)
+        self._loaded = False
+        self._thread = None
+        self._stopped = threading.Event()
+        self._lock = threading.Lock()
+
+    def record(self, movie_id, activity):
+        """Count one ``activity`` (a key of ACTIVITY_WEIGHTS) for ``movie_id``."""
+        now = self.clock()
+        amount = ACTIVITY_WEIGHTS[activity]
+        with self._lock:
+            for name, window in WINDOWS.items():
+                slot = window.slot_at(now)
+                self._rings[name].add(movie_id, slot, amount)
+                self._pending[name, movie_id, slot] += amount
+        self._start()
+
+    def top(self, window, k=10):
+        """
+        Return the ``k`` highest-scoring movies in ``window``.
+
+        Returns:
+            list: ``(movie_id, score)`` pairs, highest score first.
+        """
+        if not self._loaded:
+            self.checkpoint()
+        self._start()
+        current_slot = WINDOWS[window].slot_at(self.clock())
+        with self._lock:
+            best = heapq.nlargest(k, self._rings[window].scores(current_slot))
+        return [(movie_id, score) for score, movie_id in best]
+
+    def _start(self):
+        if not self.background or self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='trending-checkpoint', daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while not self._stopped.wait(self.checkpoint_seconds):
+            try:
+                self.checkpoint()
+            except Exception:
+                logger.exception("Trending checkpoint failed; its increments are retried next time.")
+            finally:
+                close_old_connections()
+
+    def stop(self):
+        """Stop the background checkpoint thread."""
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def checkpoint(self):
+        """
+        Flush local increments to ``TrendingCounter`` and reload the merged counts.
+
+        Slots that have left their window are deleted from the table. If the
+        flush fails, the increments are put back and sent with the next one.
+        """
+        now = self.clock()
+        with self._lock:
+            pending, self._pending = self._pending, defaultdict(float)
+
+        rings = {name: RingCounter(window) for name, window in WINDOWS.items()}
+        try:
+            live_movies = set(
+                Movie.objects.filter(pk__in={movie_id for _, movie_id, _ in pending}).values_list('pk', flat=True)
+            ) if pending else set()
+            with transaction.atomic():
+                for (name, movie_id, slot), amount in pending.items():
+                    if movie_id in live_movies:
+                        TrendingCounter.objects.add(movie_id, name, slot, amount)
+                for name, window in WINDOWS.items():
+                    oldest = window.slot_at(now) - window.slots
+                    TrendingCounter.objects.filter(window=name, slot__lte=oldest).delete()
+                    for movie_id, slot, count in TrendingCounter.objects.filter(
+                        window=name, slot__gt=oldest,
+                    ).values_list('movie_id', 'slot', 'count'):
+                        rings[name].add(movie_id, slot, count)
+        except Exception:
+            with self._lock:
+                for key, amount in pending.items():
+                    self._pending[key] += amount
+            raise
+
+        with self._lock:
+            # Activity recorded while the checkpoint ran is still pending;
+            # fold it into the reloaded rings so it is not lost locally.
+            for (name, movie_id, slot), amount in self._pending.items():
+                rings[name].add(movie_id, slot, amount)
+            self._rings = rings
+        self._loaded = True
+
+
+tracker = TrendingTracker(checkpoint_seconds=getattr(settings, 'TRENDING_CHECKPOINT_SECONDS', 60))
@@ -1,10 +1,14 @@
+from django.urls import path
 from rest_framework.routers import DefaultRouter
-from .views import MovieViewSet, ReviewViewSet, RatingViewSet, CommentViewSet
+from .views import MovieViewSet, ReviewViewSet, RatingViewSet, CommentViewSet, ChangeFeedViewSet, live_events
 
 router = DefaultRouter()
 router.register(r'movies', MovieViewSet, basename='movie')
 router.register(r'reviews', ReviewViewSet, basename='review')
 router.register(r'ratings', RatingViewSet, basename='rating')
 router.register(r'comments', CommentViewSet, basename='comment')
+router.register(r'changes', ChangeFeedViewSet, basename='change')
 
-urlpatterns = router.urls
\ No newline at end of file
+urlpatterns = router.urls + [
+    path('events/', live_events, name='live-events'),
+]
\ No newline at end of file
@@ -1,28 +1,185 @@
-from rest_framework.viewsets import ModelViewSet
+from rest_framework import serializers, status
+from rest_framework.viewsets import ModelViewSet, ViewSet
 from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
+from rest_framework.filters import OrderingFilter
 from rest_framework.response import Response
+from drf_spectacular.types import OpenApiTypes
+from drf_spectacular.utils import OpenApiParameter, extend_schema, extend_schema_view, inline_serializer
+import datetime
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.http import HttpResponse, HttpResponseBadRequest, StreamingHttpResponse
 from django.shortcuts import render
-from django.db.models import Avg
-from .models import Movie, Review, Rating, Comment
-from .serializers import MovieSerializer, ReviewSerializer, RatingSerializer, CommentSerializer
+from django.db import transaction
+from django.db.models import Count
+from . import catalog, events, trending
+from .filters import INT64_MAX, IndexedFilterBackend, finite_float, int64
+from .models import Movie, Review, Rating, Comment, ChangeLogEntry, RatingRollup
+from .pagination import MOVIE_COUNT_CACHE_KEY, CachedCountPaginator, forget_movie_count
+from .serializers import (
+    MovieSerializer, ReviewSerializer, RatingSerializer, CommentSerializer,
+    MovieSummarySerializer, ReviewSummarySerializer, RatingUpsertSerializer, RatingRollupSerializer,
+)
+
+class BatchRetrieveMixin:
+    """
+    Adds a ``batch`` list action that retrieves several objects by id.
+
+    GET  /api/v1/<resource>/batch/?ids=1,2,3
+    POST /api/v1/<resource>/batch/ with body {"ids": [1, 2, 3]}
+
+    All objects are loaded with one ``in_bulk`` query plus the viewset's
+    ``batch_prefetch`` lookups, shared across the batch. Results follow the
+    requested order (duplicates removed) and missing ids are returned as
+    explicit not-found entries. At most ``BATCH_MAX_IDS`` ids are accepted.
+    """
+    batch_prefetch = ()
+
+    @action(detail=False, methods=['get', 'post'])
+    def batch(self, request, **kwargs):
+        ids = self._batch_ids(request)
+        objects = self.get_queryset().prefetch_related(*self.batch_prefetch).in_bulk(ids)
+        results = []
+        for pk in ids:
+            obj = objects.get(pk)
+            if obj is None:
+                results.append({'id': pk, 'found': False, 'data': None})
+            else:
+                results.append({'id': pk, 'found': True, 'data': self.get_serializer(obj).data})
+        return Response({'results': results})
+
+    def _batch_ids(self, request):
+        if request.method == 'POST':
+            raw = request.data.get('ids') if hasattr(request.data, 'get') else None
+            if not isinstance(raw, list):
+                raise ValidationError({'ids': 'Expected a list of ids.'})
+        else:
+            raw = [part for part in request.query_params.get('ids', '').split(',') if part.strip()]
+        ids = list(dict.fromkeys(self._batch_id(pk) for pk in raw))
+        max_ids = getattr(settings, 'BATCH_MAX_IDS', 100)
+        if not ids:
+            raise ValidationError({'ids': 'At least one id is required.'})
+        if len(ids) > max_ids:
+            raise ValidationError({'ids': f'At most {max_ids} ids may be requested at once.'})
+        return ids
+
+    @staticmethod
+    def _batch_id(value):
+        """Accept an int or a string of digits that fits a 64-bit primary key."""
+        if isinstance(value, str) and value.strip().isascii() and value.strip().isdigit():
+            value = int(value)
+        # bool is an int subclass; JSON true must not become id 1.
+        if type(value) is not int or not 0 <= value <= INT64_MAX:
+            raise ValidationError({'ids': 'Ids must be integers between 0 and 2**63 - 1.'})
+        return value
+
+
+def batch_schema(serializer_class):
+    """Document a viewset's ``batch`` action for ``serializer_class`` objects."""
+    name = serializer_class.Meta.model.__name__
+    response = inline_serializer(f'{name}BatchResponse', fields={
+        'results': inline_serializer(f'{name}BatchResult', many=True, fields={
+            'id': serializers.IntegerField(),
+            'found': serializers.BooleanField(),
+            'data': serializer_class(allow_null=True),
+        }),
+    })
+    return [
+        extend_schema(methods=['GET'], responses=response, parameters=[
+            OpenApiParameter('ids', OpenApiTypes.STR, required=True, description="Comma-separated ids."),
+        ]),
+        extend_schema(methods=['POST'], responses=response, request=inline_serializer(f'{name}BatchRequest', fields={
+            'ids': serializers.ListField(child=serializers.IntegerField(min_value=0)),
+        })),
+    ]
+
 
-class MovieViewSet(ModelViewSet):
+@extend_schema_view(batch=batch_schema(MovieSerializer))
+class MovieViewSet(BatchRetrieveMixin, ModelViewSet):
     """
     ViewSet for Movie CRUD operations.
     
     Provides endpoints for creating, listing, retrieving, updating, and deleting movies.
     Supports versioning via URL path (e.g., /api/v1/movies/).
     
+    Query Parameters (list):
+        - release_year__gte, release_year__lte: Release year range
+        - director: Exact director name
+        - rating__gte: Minimum movie rating
+        - min_avg_user_rating: Minimum average user rating
+        - ordering: One of ``ordering_fields``, prefixed with ``-`` for descending
+        - nested: ``false`` lists movie summaries without reviews and ratings,
+          cut to ``limit`` rows if given
+
     Custom Actions:
         - average_rating: Returns the average user rating for a specific movie.
+        - my_rating: Create or replace a user's rating of a specific movie.
+        - rating_trend: Rating count, average and histogram per day or month.
+        - trending: Most active movies over a recent window.
+        - batch: Retrieve several movies by id (see BatchRetrieveMixin).
     """
     queryset = Movie.objects.all()
     serializer_class = MovieSerializer
-    
+    batch_prefetch = ('reviews__comments', 'user_ratings')
+    filter_backends = [IndexedFilterBackend, OrderingFilter]
+    filter_params = {
+        'release_year__gte': ('release_year__gte', int64),
+        'release_year__lte': ('release_year__lte', int64),
+        'director': ('director', str),
+        'rating__gte': ('rating__gte', finite_float),
+        'min_avg_user_rating': ('average_user_rating__gte', finite_float),
+    }
+    ordering_fields = ['id', 'title', 'director', 'release_year', 'rating', 'average_user_rating']
+
+    def list(self, request, *args, **kwargs):
+        """
+        List movies, or movie summaries when ``?nested=false``.
+
+        Summaries are served from the in-memory catalog snapshot when
+        ``MOVIE_CATALOG_SNAPSHOT`` is enabled and the snapshot covers the
+        requested filters and ordering (see movies/catalog.py), and from a
+        single query on the movie table otherwise.
+        """
+        if request.query_params.get('nested') != 'false':
+            return super().list(request, *args, **kwargs)
+        limit = request.query_params.get('limit')
+        if limit is not None:
+            if not (limit.isascii() and limit.isdigit()) or int(limit) > INT64_MAX:
+                raise ValidationError({'limit': 'Must be an integer >= 0.'})
+            limit = int(limit)
+        lookups = IndexedFilterBackend().get_lookups(request, self)
+        ordering = OrderingFilter().get_ordering(request, self.get_queryset(), self)
+        if (getattr(settings, 'MOVIE_CATALOG_SNAPSHOT', False) and set(lookups) <= set(catalog.LOOKUPS)
+                and (not ordering or len(ordering) == 1 and ordering[0].lstrip('-') in catalog.ORDERINGS)):
+            return Response(catalog.snapshot.query(**lookups, ordering=ordering[0] if ordering else 'id', limit=limit))
+        # Order by id by default and break ties by id, as the catalog snapshot does.
+        movies = self.get_queryset().filter(**lookups).only(*catalog.FIELDS).order_by(*(ordering or ()), 'id')
+        if limit is not None:
+            movies = movies[:limit]
+        return Response(MovieSummarySerializer(movies, many=True).data)
+
+    def perform_destroy(self, instance):
+        """
+        Delete the movie and its reviews, ratings and comments with set-based SQL.
+
+        The collector behind ``Model.delete()`` would load every related row
+        into memory first; ``bulk_delete`` issues a few statements per table
+        and writes the change log tombstones itself.
+        """
+        Movie.objects.filter(pk=instance.pk).bulk_delete()
+        if catalog.snapshot.generation is not None:
+            # bulk_delete sends no signals; drop the row from the snapshot now
+            # rather than at its next change log check.
+            pk = instance.pk
+            transaction.on_commit(lambda: catalog.snapshot.remove(pk))
+
     @action(detail=True, methods=['get'])
     def average_rating(self, request, pk=None, **kwargs):
         """
-        Calculate and return the average rating from all user ratings for a movie.
+        Return the average rating from all user ratings for a movie.
         
         GET /api/v1/movies/{id}/average_rating/
         
@@ -30,12 +187,112 @@ class MovieViewSet(ModelViewSet):
             Response: {'average_rating': float} or 0 if no ratings exist.
         """
         movie = self.get_object()
-        ratings = movie.user_ratings.all()
-        avg = ratings.aggregate(Avg('rating'))['rating__avg'] or 0
-        return Response({'average_rating': avg})
+        return Response({'average_rating': movie.average_user_rating})
 
+    @extend_schema(request=RatingUpsertSerializer, responses={200: RatingSerializer, 201: RatingSerializer})
+    @action(detail=True, methods=['put'])
+    def my_rating(self, request, pk=None, **kwargs):
+        """
+        Create or replace the requesting user's rating of a movie.
+
+        PUT /api/v1/movies/{id}/my_rating/ with {"user_name": str, "rating": int}
+
+        Re-rating updates the existing row in place with a single upsert
+        statement, so a user has at most one rating per movie.
+
+        Returns:
+            Response: The stored rating; 201 if it was created, 200 if replaced.
+        """
+        movie = self.get_object()
+        serializer = RatingUpsertSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        rating, created = Rating.objects.upsert(movie=movie, **serializer.validated_data)
+        return Response(
+            RatingSerializer(rating).data,
+            status=status.HTTP_201_CREATED if created else status.HTTP_200_OK,
+        )
+
+    @extend_schema(
+        parameters=[
+            OpenApiParameter('granularity', OpenApiTypes.STR, enum=(RatingRollup.DAY, RatingRollup.MONTH),
+                             default=RatingRollup.MONTH),
+            OpenApiParameter('start', OpenApiTypes.DATE),
+            OpenApiParameter('end', OpenApiTypes.DATE),
+        ],
+        responses=inline_serializer('RatingTrend', fields={
+            'granularity': serializers.CharField(),
+            'buckets': RatingRollupSerializer(many=True),
+        }),
+    )
+    @action(detail=True, methods=['get'])
+    def rating_trend(self, request, pk=None, **kwargs):
+        """
+        Return a movie's rating trend from the precomputed rollups.
+
+        GET /api/v1/movies/{id}/rating_trend/?granularity=day|month&start=YYYY-MM-DD&end=YYYY-MM-DD
+
+        Reads one rollup row per bucket (never the raw ratings), so the cost
+        is proportional to the number of buckets in the range.
 
-class ReviewViewSet(ModelViewSet):
+        Returns:
+            Response: {'granularity': str, 'buckets': [{'bucket', 'count', 'average', 'histogram'}]}
+        """
+        granularity = request.query_params.get('granularity', RatingRollup.MONTH)
+        if granularity not in (RatingRollup.DAY, RatingRollup.MONTH):
+            raise ValidationError({'granularity': 'Must be "day" or "month".'})
+        rollups = RatingRollup.objects.filter(movie=self.get_object(), granularity=granularity)
+        for param, lookup in (('start', 'bucket__gte'), ('end', 'bucket__lte')):
+            value = request.query_params.get(param)
+            if value:
+                try:
+                    day = datetime.date.fromisoformat(value)
+                except ValueError:
+                    raise ValidationError({param: 'Must be a date (YYYY-MM-DD).'})
+                rollups = rollups.filter(**{lookup: RatingRollup.bucket_for(day, granularity)})
+        return Response({
+            'granularity': granularity,
+            'buckets': RatingRollupSerializer(rollups.order_by('bucket'), many=True).data,
+        })
+
+    @extend_schema(parameters=[
+        OpenApiParameter('window', OpenApiTypes.STR, enum=tuple(trending.WINDOWS), default='24h'),
+        OpenApiParameter('limit', OpenApiTypes.INT, default=10),
+    ])
+    @action(detail=False, methods=['get'])
+    def trending(self, request, **kwargs):
+        """
+        Return the most active movies over a recent window.
+
+        GET /api/v1/movies/trending/?window=1h|24h|7d&limit=10
+
+        Scores come from in-memory activity counters (see movies/trending.py)
+        in which recent activity weighs more; only the returned movies are
+        read from the database.
+
+        Returns:
+            Response: {'window': str, 'results': [{'movie': {...}, 'score': float}]}
+        """
+        window = request.query_params.get('window', '24h')
+        if window not in trending.WINDOWS:
+            raise ValidationError({'window': 'Must be one of %s.' % ', '.join(trending.WINDOWS)})
+        try:
+            limit = min(int(request.query_params.get('limit', 10)), 100)
+        except ValueError:
+            raise ValidationError({'limit': 'Must be an integer.'})
+        top = trending.tracker.top(window, max(limit, 1))
+        movies = Movie.objects.in_bulk([movie_id for movie_id, _ in top])
+        return Response({
+            'window': window,
+            'results': [
+                {'movie': MovieSummarySerializer(movies[movie_id]).data, 'score': round(score, 3)}
+                for movie_id, score in top
+                if movie_id in movies
+            ],
+        })
+
+
+@extend_schema_view(batch=batch_schema(ReviewSerializer))
+class ReviewViewSet(BatchRetrieveMixin, ModelViewSet):
     """
     ViewSet for Review CRUD operations.
     
@@ -43,19 +300,22 @@ class ReviewViewSet(ModelViewSet):
     
     Query Parameters:
         -(movie_id): Filter reviews for a specific movie (e.g., ?movie_id=1)
+        - user_name: Filter reviews by author
+        - ordering: created_at or -created_at (default)
     
     Custom Actions:
         - mark_helpful: Increment the helpful count for a review.
+        - batch: Retrieve several reviews by id (see BatchRetrieveMixin).
     """
     queryset = Review.objects.all()
     serializer_class = ReviewSerializer
-    
-    def get_queryset(self):
-        """Filter reviews by movie_id if provided in query parameters."""
-        movie_id = self.request.query_params.get('movie_id')
-        if movie_id:
-            return Review.objects.filter(movie_id=movie_id)
-        return Review.objects.all()
+    batch_prefetch = ('comments',)
+    filter_backends = [IndexedFilterBackend, OrderingFilter]
+    filter_params = {
+        'movie_id': ('movie_id', int64),
+        'user_name': ('user_name', str),
+    }
+    ordering_fields = ['created_at']
     
     @action(detail=True, methods=['post'])
     def mark_helpful(self, request, pk=None, **kwargs):
@@ -70,18 +330,19 @@ class ReviewViewSet(ModelViewSet):
         review = self.get_object()
         review.helpful_count += 1
         review.save()
+        transaction.on_commit(lambda: trending.tracker.record(review.movie_id, 'helpful'))
         return Response({'helpful_count': review.helpful_count})
 
 
 class RatingViewSet(ModelViewSet):
     queryset = Rating.objects.all()
     serializer_class = RatingSerializer
-    
-    def get_queryset(self):
-        movie_id = self.request.query_params.get('movie_id')
-        if movie_id:
-            return Rating.objects.filter(movie_id=movie_id)
-        return Rating.objects.all()
+    filter_backends = [IndexedFilterBackend, OrderingFilter]
+    filter_params = {
+        'movie_id': ('movie_id', int64),
+        'user_name': ('user_name', str),
+    }
+    ordering_fields = ['created_at']
 
 
 class CommentViewSet(ModelViewSet):
@@ -93,35 +354,206 @@ class CommentViewSet(ModelViewSet):
     Query Parameters:
         - movie_id: Filter comments for a specific movie (e.g., ?movie_id=1)
         - review_id: Filter comments for a specific review (e.g., ?review_id=1)
+        - user_name: Filter comments by author
+        - ordering: created_at or -created_at (default)
     """
     queryset = Comment.objects.all()
     serializer_class = CommentSerializer
-    
-    def get_queryset(self):
-        """Filter comments by movie_id or review_id if provided in query parameters."""
-        movie_id = self.request.query_params.get('movie_id')
-        review_id = self.request.query_params.get('review_id')
-        if movie_id:
-            return Comment.objects.filter(movie_id=movie_id)
-        if review_id:
-            return Comment.objects.filter(review_id=review_id)
-        return Comment.objects.all()
+    filter_backends = [IndexedFilterBackend, OrderingFilter]
+    filter_params = {
+        'movie_id': ('movie_id', int64),
+        'review_id': ('review_id', int64),
+        'user_name': ('user_name', str),
+    }
+    ordering_fields = ['created_at']
+
+
+class ChangeFeedViewSet(ViewSet):
+    """
+    Incremental changes feed for client sync.
+
+    GET /api/v1/changes/?since=<cursor>
+
+    Returns change log entries with ``seq`` greater than ``since`` in sequence
+    order. Upserts carry the current state of the row; deletes (including
+    cascaded ones) are tombstones with ``data`` set to null. Each page costs
+    one range scan on the log plus one ``in_bulk`` query per model kind, so
+    sync cost follows the number of changes, not the size of the catalog.
+
+    Query Parameters:
+        - since: Cursor returned as ``next_cursor`` by the previous page (default 0)
+        - limit: Maximum entries per page (default/maximum from ``CHANGES_FEED_PAGE_SIZE``)
+    """
+    kinds = {
+        'movie': (Movie, MovieSummarySerializer),
+        'review': (Review, ReviewSummarySerializer),
+        'rating': (Rating, RatingSerializer),
+        'comment': (Comment, CommentSerializer),
+    }
+
+    @extend_schema(
+        parameters=[OpenApiParameter('since', int), OpenApiParameter('limit', int)],
+        responses=OpenApiTypes.OBJECT,
+    )
+    def list(self, request, **kwargs):
+        since = self._int_param(request, 'since', 0)
+        max_limit = getattr(settings, 'CHANGES_FEED_PAGE_SIZE', 500)
+        limit = min(self._int_param(request, 'limit', max_limit), max_limit)
+        if since < 0 or limit < 1:
+            raise ValidationError({'detail': 'since must be >= 0 and limit >= 1.'})
+
+        entries = list(ChangeLogEntry.objects.filter(seq__gt=since).order_by('seq')[:limit + 1])
+        has_more = len(entries) > limit
+        entries = entries[:limit]
+
+        # Deleted rows are absent from in_bulk, so an upsert superseded by a
+        # later delete is skipped here and only its tombstone is sent.
+        rows = {}
+        for kind, (model, _) in self.kinds.items():
+            ids = {e.object_id for e in entries if e.kind == kind and e.op == ChangeLogEntry.UPSERT}
+            rows[kind] = model.objects.in_bulk(ids) if ids else {}
+
+        changes = []
+        for entry in entries:
+            change = {'seq': entry.seq, 'kind': entry.kind, 'id': entry.object_id, 'op': entry.op, 'data': None}
+            if entry.op == ChangeLogEntry.UPSERT:
+                obj = rows.get(entry.kind, {}).get(entry.object_id)
+                if obj is None:
+                    continue
+                change['data'] = self.kinds[entry.kind][1](obj).data
+            changes.append(change)
+
+        next_cursor = entries[-1].seq if entries else since
+        return Response({'changes': changes, 'next_cursor': next_cursor, 'has_more': has_more})
+
+    @staticmethod
+    def _int_param(request, name, default):
+        value = request.query_params.get(name)
+        if value in (None, ''):
+            return default
+        try:
+            return int(value)
+        except ValueError:
+            raise ValidationError({name: 'Must be an integer.'})
+
+
+async def live_events(request, version=None):
+    """
+    Server-sent events stream of new and updated reviews, ratings and comments.
+
+    GET /api/v1/events/?movie_id=<id>
+
+    Events are pushed from the in-process broker in ``movies/events.py``;
+    an idle connection only receives periodic keep-alive comments and never
+    touches the database. Requires an ASGI server (see ``movie/asgi.py``).
+
+    Resuming with a ``Last-Event-ID`` header replays buffered events. If the
+    id is older than the buffer, a ``reset`` event is sent first and the
+    client should catch up from ``/api/v1/changes/?since=<last id>``. Slow
+    consumers whose queue fills up are disconnected so they reconnect and
+    resume instead of growing server memory.
+
+    Under WSGI Django would buffer the endless stream in memory while holding
+    a worker, so non-ASGI requests get 501 instead.
+    """
+    if not isinstance(request, ASGIRequest):
+        return HttpResponse("The live event stream requires an ASGI server.", status=501, content_type='text/plain')
+    try:
+        movie_id = int(request.GET['movie_id']) if request.GET.get('movie_id') else None
+        last_event_id = request.headers.get('Last-Event-ID') or request.GET.get('last_event_id')
+        last_event_id = int(last_event_id) if last_event_id else None
+    except ValueError:
+        return HttpResponseBadRequest("movie_id and Last-Event-ID must be integers.")
+
+    heartbeat = getattr(settings, 'EVENTS_HEARTBEAT_SECONDS', 15)
+    if last_event_id is not None and events.broker.floor is None:
+        await sync_to_async(events.broker.load_floor)()
+    subscription, missed = events.broker.subscribe(movie_id=movie_id, last_event_id=last_event_id)
+
+    async def stream():
+        try:
+            yield "retry: 3000\n\n"
+            if missed:
+                yield f"event: reset\ndata: {{\"since\": {last_event_id}}}\n\n"
+            while True:
+                event = await subscription.get(timeout=heartbeat)
+                if subscription.overflowed:
+                    return
+                yield event.encode() if event else ": keep-alive\n\n"
+        finally:
+            events.broker.unsubscribe(subscription)
+
+    return StreamingHttpResponse(
+        stream(),
+        content_type='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'},
+    )
+
+
+# ordering parameter -> (label, order_by fields); every option is index-backed.
+HOMEPAGE_ORDERINGS = {
+    'newest': ('Newest', ('-release_year', '-pk')),
+    'oldest': ('Oldest', ('release_year', 'pk')),
+    'title': ('Title', ('title', 'pk')),
+    'top_rated': ('Top rated', ('-average_user_rating', '-pk')),
+}
 
 
 def homepage(request):
-    movies = Movie.objects.all()
-    total_movies = movies.count()
-    recent_movies = movies.order_by('-release_year')[:5]
-    
-    # Add review counts and average ratings for each movie
-    for movie in movies:
-        movie.review_count = movie.reviews.count()
-        ratings = movie.user_ratings.all()
-        movie.average_user_rating = sum(r.rating for r in ratings) / ratings.count() if ratings.exists() else 0
-    
+    """
+    Render one page of the movie catalog.
+
+    Query Parameters:
+        - page: Page number (default 1)
+        - ordering: One of HOMEPAGE_ORDERINGS (default 'newest')
+
+    Only the current page's movies and their review counts are loaded;
+    reviews themselves are fetched per movie when a panel is expanded (see
+    ``movie_reviews_fragment``), so render time does not grow with the catalog.
+    The movie total is an exact count cached for ``HOMEPAGE_COUNT_CACHE_SECONDS``.
+    """
+    ordering = request.GET.get('ordering')
+    if ordering not in HOMEPAGE_ORDERINGS:
+        ordering = 'newest'
+    movies = Movie.objects.order_by(*HOMEPAGE_ORDERINGS[ordering][1])
+    paginator = CachedCountPaginator(
+        movies, getattr(settings, 'HOMEPAGE_PAGE_SIZE', 24),
+        cache_key=MOVIE_COUNT_CACHE_KEY, timeout=getattr(settings, 'HOMEPAGE_COUNT_CACHE_SECONDS', 60),
+    )
+    page = paginator.get_page(request.GET.get('page'))
+    if not page.object_list and page.number > 1:
+        # The cached count outlived rows deleted by another process.
+        forget_movie_count()
+        paginator = CachedCountPaginator(movies, paginator.per_page, MOVIE_COUNT_CACHE_KEY, paginator.timeout)
+        page = paginator.get_page(request.GET.get('page'))
+
+    review_counts = dict(
+        Review.objects.filter(movie__in=[movie.pk for movie in page])
+        .order_by().values('movie').annotate(n=Count('pk')).values_list('movie', 'n')
+    )
+    for movie in page:
+        movie.review_count = review_counts.get(movie.pk, 0)
+
     context = {
-        'total_movies': total_movies,
-        'recent_movies': recent_movies,
-        'movies': movies,
+        'total_movies': paginator.count,
+        'recent_movies': Movie.objects.order_by('-release_year')[:5],
+        'movies': page,
+        'page_obj': page,
+        'ordering': ordering,
+        'orderings': [(key, label) for key, (label, _) in HOMEPAGE_ORDERINGS.items()],
     }
-    return render(request, 'movies/homepage.html', context)
\ No newline at end of file
+    return render(request, 'movies/homepage.html', context)
+
+
+def movie_reviews_fragment(request, movie_id):
+    """
+    Render the latest reviews of one movie as an HTML fragment.
+
+    GET /movies/{id}/reviews/
+
+    Loaded by the homepage's ``toggleReviews`` when a review panel is first
+    expanded. Returns at most ``HOMEPAGE_REVIEWS_PER_MOVIE`` reviews.
+    """
+    limit = getattr(settings, 'HOMEPAGE_REVIEWS_PER_MOVIE', 10)
+    reviews = Review.objects.filter(movie_id=movie_id).order_by('-created_at')[:limit]
+    return render(request, 'movies/_reviews.html', {'reviews': reviews})